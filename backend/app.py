@@ -6,17 +6,18 @@ from logging.handlers import RotatingFileHandler
 import json
 from datetime import datetime
 import os
+import threading
 
 load_dotenv()
 
 # Config
 from config import Config
-from db import db
+from db import db, ensure_schema
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = Config.SQLALCHEMY_DATABASE_URI
 app.config['UPLOAD_FOLDER'] = Config.UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 20 * 1024 * 1024  # 20MB
+app.config['MAX_CONTENT_LENGTH'] = Config.UPLOAD_MAX_MB * 1024 * 1024
 
 # CORS (ENV-configurable, default to localhost:5173)
 CORS(app, resources={r"/*": {"origins": [Config.FRONTEND_ORIGIN]}})
@@ -51,12 +52,16 @@ from routes.image_routes import image_bp  # noqa: E402
 from routes.ocr_routes import ocr_bp  # noqa: E402
 from routes.structure_routes import structure_bp  # noqa: E402
 from routes.chatbot_routes import chatbot_bp  # noqa: E402
+from routes.job_routes import job_bp  # noqa: E402
+from services.job_service import recover_jobs  # noqa: E402
+from ocr.pool import prestart  # noqa: E402
 app.register_blueprint(upload_bp)
 app.register_blueprint(extract_bp)
 app.register_blueprint(image_bp)
 app.register_blueprint(ocr_bp)
 app.register_blueprint(structure_bp)
 app.register_blueprint(chatbot_bp)
+app.register_blueprint(job_bp)
 
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -69,6 +74,9 @@ os.makedirs(images_dir, exist_ok=True)
 # Ensure processed images directory exists
 processed_dir = os.path.join(images_dir, 'processed')
 os.makedirs(processed_dir, exist_ok=True)
+# Ensure renditions cache directory exists
+renditions_dir = os.path.join(images_dir, 'renditions')
+os.makedirs(renditions_dir, exist_ok=True)
 
 # Rotating file logger (JSON) under /logs
 try:
@@ -99,13 +107,41 @@ except Exception:
 # Models (import after db created)
 from models.pdf_model import PDFUpload  # noqa: E402,F401
 from models.ocr_extracted import OCRExtracted  # noqa: E402,F401
+from models.extracted_image import ExtractedImage  # noqa: E402,F401
+from models.extracted_text import ExtractedText  # noqa: E402,F401
+from models.extracted_page import ExtractedPage  # noqa: E402,F401
+from models.job import Job  # noqa: E402,F401
+from models.ocr_batch import OCRBatch, OCRBatchItem  # noqa: E402,F401
+from models.upload_session import UploadSession  # noqa: E402,F401
+from models.upload_batch import UploadBatch  # noqa: E402,F401
 
 # DB init
 with app.app_context():
-    db.create_all()
+    ensure_schema()
     app.logger.info("database initialized", extra={"context": {"db": app.config['SQLALCHEMY_DATABASE_URI']}})
 
 
+_background_started = False
+_background_lock = threading.Lock()
+
+
+@app.before_request
+def _start_background_once():
+    # Done lazily so only the serving process (not the reloader parent)
+    # resumes jobs and starts OCR workers
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    recover_jobs(app)
+    if Config.OCR_WARMUP:
+        try:
+            prestart(Config.OCR_WORKERS)
+        except Exception:
+            app.logger.error('ocr warm-up failed')
+
+
 @app.after_request
 def _after_request_log(response):
     try:
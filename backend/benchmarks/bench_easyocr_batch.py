@@ -0,0 +1,80 @@
+"""Throughput of per-image EasyOCR vs batched readtext_batched on CPU.
+
+Usage (from backend/):
+    python -m benchmarks.bench_easyocr_batch static/images [--batch-size 8] [--tolerance 128]
+
+Images are preprocessed up front so only EasyOCR time is measured. The
+batched run uses the same size grouping as /extract-ocr-data.
+"""
+import argparse
+import os
+import sys
+import time
+
+from ocr.preprocess import preprocess_image
+from ocr.engines import ocr_easyocr, ocr_easyocr_batch
+from ocr.pipeline import group_by_size
+
+IMAGE_EXTS = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff'}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument('images_dir')
+    ap.add_argument('--batch-size', type=int, default=8)
+    ap.add_argument('--tolerance', type=int, default=128)
+    ap.add_argument('--limit', type=int, default=0)
+    args = ap.parse_args(argv)
+
+    paths = sorted(
+        os.path.join(args.images_dir, f) for f in os.listdir(args.images_dir)
+        if os.path.splitext(f.lower())[1] in IMAGE_EXTS
+    )
+    if args.limit:
+        paths = paths[:args.limit]
+    if not paths:
+        print(f"no images in {args.images_dir}", file=sys.stderr)
+        return 1
+
+    images = [preprocess_image(p) for p in paths]
+    # Warm the reader so model load is not charged to either run
+    ocr_easyocr(images[0])
+
+    t = time.perf_counter()
+    single = [ocr_easyocr(img) for img in images]
+    single_s = time.perf_counter() - t
+
+    groups = group_by_size([img.shape[:2] for img in images], args.batch_size, args.tolerance)
+    batched = [""] * len(images)
+    t = time.perf_counter()
+    for group in groups:
+        for k, text in zip(group, ocr_easyocr_batch([images[k] for k in group], args.batch_size)):
+            batched[k] = text
+    batched_s = time.perf_counter() - t
+
+    padded_px = sum(
+        max(images[k].shape[0] for k in g) * max(images[k].shape[1] for k in g) * len(g)
+        for g in groups
+    )
+    real_px = sum(img.shape[0] * img.shape[1] for img in images)
+    same = sum(1 for a, b in zip(single, batched) if a == b)
+
+    n = len(images)
+    rows = [
+        ("images", f"{n} in {len(groups)} groups "
+                   f"(batch size {args.batch_size}, tolerance {args.tolerance}px)"),
+        ("padding overhead", f"{padded_px / max(real_px, 1) - 1:+.1%} pixels"),
+        ("per-image", f"{single_s:.2f} s ({n / max(single_s, 1e-9):.2f} images/s)"),
+        ("batched", f"{batched_s:.2f} s ({n / max(batched_s, 1e-9):.2f} images/s)"),
+        ("speedup", f"{single_s / max(batched_s, 1e-9):.2f}x"),
+        ("identical text", f"{same}/{n}"),
+    ]
+    for label, value in rows:
+        print(f"{label + ':':18} {value}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Bytes written and time per image: PNG re-encode vs native passthrough.
+
+Usage (from backend/):
+    python -m benchmarks.bench_image_extract static/uploads/brochure.pdf [--repeat 3]
+
+Every unique image xref of the PDF is extracted once up front, then written
+with save_extracted_image in both modes into temporary directories, so only
+the write path (decode/encode/IO) is measured.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+from services.image_service import save_extracted_image
+
+
+def _run(images: list[dict], passthrough: bool, repeat: int) -> tuple[float, int]:
+    best = float('inf')
+    written = 0
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as out_dir:
+            t = time.perf_counter()
+            names = [
+                save_extracted_image(img, out_dir, f"img{i}", passthrough)[0]
+                for i, img in enumerate(images)
+            ]
+            best = min(best, time.perf_counter() - t)
+            written = sum(os.path.getsize(os.path.join(out_dir, n)) for n in names)
+    return best, written
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument('pdf')
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args(argv)
+
+    with fitz.open(args.pdf) as doc:
+        xrefs = sorted({img[0] for page in doc for img in page.get_images(full=True)})
+        images = [doc.extract_image(x) for x in xrefs]
+    if not images:
+        print(f"no images in {args.pdf}", file=sys.stderr)
+        return 1
+
+    n = len(images)
+    exts = {}
+    for img in images:
+        exts[img['ext']] = exts.get(img['ext'], 0) + 1
+    source_bytes = sum(len(img['image']) for img in images)
+    png_s, png_bytes = _run(images, False, args.repeat)
+    pass_s, pass_bytes = _run(images, True, args.repeat)
+
+    rows = [
+        ("images", f"{n} unique xrefs ({', '.join(f'{e}: {c}' for e, c in sorted(exts.items()))})"),
+        ("embedded bytes", f"{source_bytes / 1024:.0f} KiB"),
+        ("png re-encode", f"{png_bytes / 1024:.0f} KiB, {png_s * 1000 / n:.1f} ms/image"),
+        ("passthrough", f"{pass_bytes / 1024:.0f} KiB, {pass_s * 1000 / n:.1f} ms/image"),
+        ("bytes saved", f"{1 - pass_bytes / max(png_bytes, 1):.1%}"),
+        ("speedup", f"{png_s / max(pass_s, 1e-9):.1f}x"),
+    ]
+    for label, value in rows:
+        print(f"{label + ':':16} {value}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Compare always-both OCR with the confidence-gated cascade.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ocr_cascade static/images [--min-conf 60] [--min-chars 20]
+
+Each image is preprocessed once, then OCR'd in both modes. Reports per-mode
+latency, how often the cascade skipped EasyOCR, and the text-yield difference.
+"""
+import argparse
+import os
+import sys
+import time
+
+from ocr.preprocess import preprocess_image
+from ocr.pipeline import run_engines
+
+IMAGE_EXTS = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff'}
+
+
+def _list_images(root: str) -> list[str]:
+    return sorted(
+        os.path.join(root, f) for f in os.listdir(root)
+        if os.path.splitext(f.lower())[1] in IMAGE_EXTS
+    )
+
+
+def _chars(text: str) -> int:
+    return len("".join(text.split()))
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument('images_dir')
+    ap.add_argument('--min-conf', type=float, default=60.0)
+    ap.add_argument('--min-chars', type=int, default=20)
+    ap.add_argument('--limit', type=int, default=0)
+    args = ap.parse_args(argv)
+
+    paths = _list_images(args.images_dir)
+    if args.limit:
+        paths = paths[:args.limit]
+    if not paths:
+        print(f"no images in {args.images_dir}", file=sys.stderr)
+        return 1
+
+    both_opts = {'mode': 'both'}
+    cascade_opts = {
+        'mode': 'cascade',
+        'cascade_min_conf': args.min_conf,
+        'cascade_min_chars': args.min_chars,
+    }
+
+    # Warm the EasyOCR reader so model load is not charged to the first image
+    run_engines(preprocess_image(paths[0]), both_opts)
+
+    totals = {'both_ms': 0.0, 'cascade_ms': 0.0, 'both_chars': 0, 'cascade_chars': 0, 'skipped': 0}
+    print(f"{'image':40} {'both_ms':>9} {'casc_ms':>9} {'both_ch':>8} {'casc_ch':>8} engines")
+    for path in paths:
+        img = preprocess_image(path)
+
+        t = time.perf_counter()
+        both_text, _ = run_engines(img, both_opts)
+        both_ms = (time.perf_counter() - t) * 1000
+
+        t = time.perf_counter()
+        casc_text, engines = run_engines(img, cascade_opts)
+        casc_ms = (time.perf_counter() - t) * 1000
+
+        totals['both_ms'] += both_ms
+        totals['cascade_ms'] += casc_ms
+        totals['both_chars'] += _chars(both_text)
+        totals['cascade_chars'] += _chars(casc_text)
+        totals['skipped'] += int('easyocr' not in engines)
+        print(f"{os.path.basename(path)[:40]:40} {both_ms:9.0f} {casc_ms:9.0f} "
+              f"{_chars(both_text):8d} {_chars(casc_text):8d} {','.join(engines)}")
+
+    n = len(paths)
+    saved = totals['both_ms'] - totals['cascade_ms']
+    yield_diff = totals['cascade_chars'] - totals['both_chars']
+    print()
+    rows = [
+        ("images", f"{n}"),
+        ("easyocr skipped", f"{totals['skipped']} ({totals['skipped'] / n:.0%})"),
+        ("latency both", f"{totals['both_ms']:.0f} ms ({totals['both_ms'] / n:.0f} ms/image)"),
+        ("latency cascade",
+         f"{totals['cascade_ms']:.0f} ms ({totals['cascade_ms'] / n:.0f} ms/image)"),
+        ("latency saved", f"{saved:.0f} ms ({saved / max(totals['both_ms'], 1e-9):.0%})"),
+        ("text yield both", f"{totals['both_chars']} chars"),
+        ("text yield cascade", f"{totals['cascade_chars']} chars ({yield_diff:+d}, "
+                               f"{yield_diff / max(totals['both_chars'], 1):+.1%})"),
+    ]
+    for label, value in rows:
+        print(f"{label + ':':20} {value}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Calibrate OCR_PHASH_MAX_DISTANCE on a directory of extracted images.
+
+Usage (from backend/):
+    python -m benchmarks.bench_phash images_dir/ [--max-distance 5]
+
+Each image is re-encoded and resized the ways brochure PDFs tend to carry
+the same picture (JPEG quality 95/75/50, 0.5x/0.75x/1.5x), and the dHash
+distance to every variant is recorded. Distinct images are compared
+pairwise. A good threshold sits above the largest same-image distance and
+below the smallest distance between different images; pairs under the
+threshold that confirm_near rejects are the false positives it filters out.
+"""
+import argparse
+import io
+import itertools
+import os
+import sys
+
+from PIL import Image
+
+from ocr.phash import confirm_near, dhash, hamming
+
+IMAGE_EXTS = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp'}
+
+
+def _variants(path: str) -> list[Image.Image]:
+    im = Image.open(path).convert('RGB')
+    out = []
+    for quality in (95, 75, 50):
+        buf = io.BytesIO()
+        im.save(buf, 'JPEG', quality=quality)
+        buf.seek(0)
+        out.append(Image.open(buf))
+    for scale in (0.5, 0.75, 1.5):
+        out.append(im.resize((max(9, int(im.width * scale)), max(8, int(im.height * scale)))))
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument('images_dir')
+    ap.add_argument('--max-distance', type=int, default=5)
+    args = ap.parse_args(argv)
+
+    paths = sorted(
+        os.path.join(args.images_dir, f) for f in os.listdir(args.images_dir)
+        if os.path.splitext(f.lower())[1] in IMAGE_EXTS
+    )
+    if len(paths) < 2:
+        print(f"need at least two images in {args.images_dir}", file=sys.stderr)
+        return 1
+
+    hashes = {p: dhash(p) for p in paths}
+    same = [hamming(hashes[p], dhash(v)) for p in paths for v in _variants(p)]
+    pairs = [(hamming(hashes[a], hashes[b]), a, b) for a, b in itertools.combinations(paths, 2)]
+    close = [(d, a, b) for d, a, b in pairs if d <= args.max_distance]
+    rejected = sum(1 for _, a, b in close if not confirm_near(a, b))
+
+    print(f"{'images:':22} {len(paths)}")
+    print(f"{'same image, max bits:':22} {max(same)} over {len(same)} variants")
+    print(f"{'different, min bits:':22} {min(d for d, _, _ in pairs)} over {len(pairs)} pairs")
+    print(f"{'different within max:':22} {len(close)} ({rejected} rejected by confirm_near)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Accuracy and cost of the OCR text-likelihood prefilter on a labelled sample set.
+
+Usage (from backend/):
+    python -m benchmarks.bench_prefilter samples/ [--thresholds 0.25,0.35,0.45]
+
+samples/ holds two subdirectories: text/ (images that contain text worth
+OCR-ing) and notext/ (photos, renders, icons, decorations). For each
+threshold the run reports how many text images would still be OCR'd
+(recall) and how many text-free images would be skipped.
+"""
+import argparse
+import os
+import sys
+import time
+
+from ocr.prefilter import should_ocr
+
+IMAGE_EXTS = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp'}
+
+
+def _images(d: str) -> list[str]:
+    if not os.path.isdir(d):
+        return []
+    return sorted(
+        os.path.join(d, f) for f in os.listdir(d)
+        if os.path.splitext(f.lower())[1] in IMAGE_EXTS
+    )
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument('samples_dir')
+    ap.add_argument('--thresholds', default='0.25,0.35,0.45')
+    args = ap.parse_args(argv)
+
+    labelled = [(p, True) for p in _images(os.path.join(args.samples_dir, 'text'))]
+    labelled += [(p, False) for p in _images(os.path.join(args.samples_dir, 'notext'))]
+    if not labelled:
+        print(f"no images under {args.samples_dir}/text or {args.samples_dir}/notext",
+              file=sys.stderr)
+        return 1
+
+    # Score once with threshold 0 (size/aspect rules still apply), then sweep
+    scored = []  # (has_text, score or None when a size/aspect rule skipped it)
+    t = time.perf_counter()
+    for path, has_text in labelled:
+        _, reason, stats = should_ocr(path, 0.0)
+        scored.append((has_text, None if reason else stats['score']))
+    elapsed = time.perf_counter() - t
+
+    n_text = sum(1 for has_text, _ in scored if has_text)
+    n_plain = len(scored) - n_text
+    rule_skips = sum(1 for _, score in scored if score is None)
+    print(f"{'images:':18} {len(scored)} ({n_text} text, {n_plain} no text)")
+    print(f"{'prefilter cost:':18} {elapsed * 1000 / len(scored):.1f} ms/image")
+    print(f"{'size/aspect skips:':18} {rule_skips}")
+    for threshold in (float(x) for x in args.thresholds.split(',') if x.strip()):
+        kept_text = sum(
+            1 for has_text, s in scored if has_text and s is not None and s >= threshold
+        )
+        skipped_plain = sum(
+            1 for has_text, s in scored if not has_text and (s is None or s < threshold)
+        )
+        print(
+            f"{f'min score {threshold:.2f}:':18} text recall {kept_text}/{n_text}, "
+            f"no-text skipped {skipped_plain}/{n_plain}"
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
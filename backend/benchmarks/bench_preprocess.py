@@ -0,0 +1,68 @@
+"""Latency and OCR character yield of each preprocessing profile.
+
+Usage (from backend/):
+    python -m benchmarks.bench_preprocess static/images [--limit 50]
+
+Every image is preprocessed with each profile (fast, balanced, heavy and
+auto) and the result OCR'd with Tesseract only, so the yield reflects the
+preprocessing rather than the engine mix. Also reports which profile auto
+picked per image.
+"""
+import argparse
+import os
+import sys
+import time
+
+from ocr import registry
+from ocr.engines import ocr_pytesseract
+from ocr.preprocess import PREPROCESS_PROFILES, choose_profile, image_stats, preprocess_image
+
+IMAGE_EXTS = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff'}
+
+
+def _chars(text: str) -> int:
+    return len("".join(text.split()))
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument('images_dir')
+    ap.add_argument('--limit', type=int, default=0)
+    args = ap.parse_args(argv)
+
+    paths = sorted(
+        os.path.join(args.images_dir, f) for f in os.listdir(args.images_dir)
+        if os.path.splitext(f.lower())[1] in IMAGE_EXTS
+    )
+    if args.limit:
+        paths = paths[:args.limit]
+    if not paths:
+        print(f"no images in {args.images_dir}", file=sys.stderr)
+        return 1
+
+    cv2 = registry.load("cv2")
+    picked = {}
+    for p in paths:
+        profile = choose_profile(image_stats(cv2.imread(p, cv2.IMREAD_GRAYSCALE)))
+        picked[profile] = picked.get(profile, 0) + 1
+
+    n = len(paths)
+    print(f"{'images:':10} {n}")
+    print(f"{'auto:':10} " + ", ".join(f"{k} {v}" for k, v in sorted(picked.items())))
+    for profile in [*PREPROCESS_PROFILES, 'auto']:
+        pre_s = 0.0
+        chars = 0
+        for p in paths:
+            t = time.perf_counter()
+            img = preprocess_image(p, profile)
+            pre_s += time.perf_counter() - t
+            chars += _chars(ocr_pytesseract(img)[0])
+        print(f"{profile + ':':10} {pre_s * 1000 / n:7.1f} ms/image preprocess, "
+              f"{chars / n:7.1f} chars/image")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Import time and RSS of app.py, and which heavy OCR/CV modules it loads.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup [--runs 5]
+
+Each run imports app in a fresh interpreter (against a throwaway SQLite
+database) so module caches don't hide the cost.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+_PROBE = r"""
+import json, sys, time
+t = time.perf_counter()
+import app  # noqa: F401
+elapsed = time.perf_counter() - t
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+except ImportError:
+    import psutil
+    rss_mb = psutil.Process().memory_info().rss / (1024 * 1024)
+heavy = ["numpy", "cv2", "pytesseract", "easyocr", "tesserocr", "torch"]
+print(json.dumps({
+    "import_s": elapsed,
+    "rss_mb": rss_mb,
+    "heavy_loaded": [m for m in heavy if m in sys.modules],
+}))
+"""
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument('--runs', type=int, default=5)
+    args = ap.parse_args(argv)
+
+    backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_uri = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        env = {**os.environ, 'SQLALCHEMY_DATABASE_URI': db_uri}
+        for _ in range(args.runs):
+            out = subprocess.run(
+                [sys.executable, '-c', _PROBE], cwd=backend_dir, env=env,
+                capture_output=True, text=True, check=True,
+            ).stdout
+            samples.append(json.loads(out.strip().splitlines()[-1]))
+
+    times = [s['import_s'] * 1000 for s in samples]
+    rss = [s['rss_mb'] for s in samples]
+    rows = [
+        ("runs", f"{len(samples)}"),
+        ("import app", f"median {statistics.median(times):.0f} ms "
+                       f"(min {min(times):.0f}, max {max(times):.0f})"),
+        ("peak RSS", f"median {statistics.median(rss):.0f} MB"),
+        ("heavy modules", ", ".join(samples[-1]['heavy_loaded']) or "none"),
+    ]
+    for label, value in rows:
+        print(f"{label + ':':15} {value}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
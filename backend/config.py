@@ -10,9 +10,74 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI", f"sqlite:///{_DB_PATH}")
     _UPLOAD_DIR = os.path.join(_BASE_DIR, 'static', 'uploads')
     UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", _UPLOAD_DIR)
+    # Largest accepted PDF; uploads past it are aborted mid-stream
+    UPLOAD_MAX_MB = int(os.getenv("UPLOAD_MAX_MB", "20"))
+    # /upload/batch: files per request (after expanding .zip archives) and total body/unpacked size
+    UPLOAD_BATCH_MAX_FILES = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "200"))
+    UPLOAD_BATCH_MAX_MB = int(os.getenv("UPLOAD_BATCH_MAX_MB", "512"))
+    # Write extracted JPEG/PNG/GIF/WebP bytes as-is instead of re-encoding to PNG
+    IMAGE_PASSTHROUGH = os.getenv("IMAGE_PASSTHROUGH", "true").lower() == "true"
+    # Process-parallel image writes for documents with many unique images (workers <= 1 = serial)
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+    IMAGE_PARALLEL_MIN_IMAGES = int(os.getenv("IMAGE_PARALLEL_MIN_IMAGES", "32"))
+    # On-disk cache of resized renditions (LRU-evicted past this size) and their browser max-age
+    RENDITION_CACHE_MAX_MB = int(os.getenv("RENDITION_CACHE_MAX_MB", "256"))
+    RENDITION_MAX_AGE = int(os.getenv("RENDITION_MAX_AGE", "86400"))
     TEXT_ENGINE = os.getenv("TEXT_ENGINE", "pymupdf")
+    # Page-parallel text extraction for large PDFs (workers <= 1 = serial)
+    TEXT_WORKERS = int(os.getenv("TEXT_WORKERS", str(min(4, os.cpu_count() or 1))))
+    TEXT_PARALLEL_MIN_PAGES = int(os.getenv("TEXT_PARALLEL_MIN_PAGES", "50"))
+    # Pages with fewer cleaned characters are treated as having no text layer
+    TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "16"))
+    # Rasterize and OCR such pages when they contain images (scanned pages)
+    TEXT_HYBRID_OCR = os.getenv("TEXT_HYBRID_OCR", "true").lower() == "true"
+    TEXT_HYBRID_DPI = int(os.getenv("TEXT_HYBRID_DPI", "300"))
     FRONTEND_ORIGIN = os.getenv("FRONTEND_ORIGIN", "http://localhost:5173")
     FLASK_ENV = os.getenv("FLASK_ENV", "development")
     # Structuring limits
     STRUCTURE_MAX_CHARS = int(os.getenv("STRUCTURE_MAX_CHARS", "1000000"))
     STRUCTURE_TIMEOUT_SECONDS = int(os.getenv("STRUCTURE_TIMEOUT_SECONDS", "12"))
+    # OCR worker pool (0 = run on the request thread)
+    OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+    OCR_IMAGE_TIMEOUT_SECONDS = int(os.getenv("OCR_IMAGE_TIMEOUT_SECONDS", "120"))
+    # Load OCR engines when the server starts instead of on the first OCR call
+    OCR_WARMUP = os.getenv("OCR_WARMUP", "false").lower() == "true"
+    # OCR engine strategy: "both" (Tesseract + EasyOCR) or "cascade"
+    OCR_MODE = os.getenv("OCR_MODE", "both")
+    OCR_CASCADE_MIN_CONF = float(os.getenv("OCR_CASCADE_MIN_CONF", "60"))
+    OCR_CASCADE_MIN_CHARS = int(os.getenv("OCR_CASCADE_MIN_CHARS", "20"))
+    # Tesseract backend: "pytesseract" (subprocess) or "tesserocr" (in-process)
+    TESSERACT_BACKEND = os.getenv("TESSERACT_BACKEND", "pytesseract").lower()
+    TESSERACT_LANG = os.getenv("TESSERACT_LANG") or None
+    # >1 batches EasyOCR over groups of similar-sized images. Opt-in: it pays off
+    # on GPU, but on CPU padding and fewer pool tasks usually make it slower
+    # (measure with benchmarks/bench_easyocr_batch.py first)
+    OCR_EASYOCR_BATCH_SIZE = int(os.getenv("OCR_EASYOCR_BATCH_SIZE", "1"))
+    # Skip OCR on icons/photos whose text-likelihood score is below the threshold
+    # (off by default until calibrated on real brochure images with
+    # benchmarks/bench_prefilter.py)
+    OCR_PREFILTER = os.getenv("OCR_PREFILTER", "false").lower() == "true"
+    OCR_PREFILTER_MIN_SCORE = float(os.getenv("OCR_PREFILTER_MIN_SCORE", "0.35"))
+    # Reuse OCR of an image, from any PDF, whose dHash is within this many
+    # bits and whose pixels confirm the match (0 disables). Re-encoded and
+    # resized copies land within 4 bits; see benchmarks/bench_phash.py
+    OCR_PHASH_MAX_DISTANCE = int(os.getenv("OCR_PHASH_MAX_DISTANCE", "5"))
+    # Preprocessing profile: auto | fast | balanced | heavy
+    OCR_PREPROCESS_PROFILE = os.getenv("OCR_PREPROCESS_PROFILE", "auto").lower()
+    # Preprocessed-image disk cache (static/images/processed), LRU-evicted
+    OCR_PREPROCESS_CACHE_MAX_MB = int(os.getenv("OCR_PREPROCESS_CACHE_MAX_MB", "1024"))
+    # Images above this size are OCR'd in tiles within a memory budget
+    OCR_TILE_MIN_MEGAPIXELS = float(os.getenv("OCR_TILE_MIN_MEGAPIXELS", "16"))
+    OCR_TILE_MEMORY_MB = int(os.getenv("OCR_TILE_MEMORY_MB", "512"))
+    # Tiles OCR'd at once; each one running EasyOCR keeps its own reader loaded
+    OCR_TILE_WORKERS = int(os.getenv("OCR_TILE_WORKERS", "2"))
+    # Load only the EasyOCR languages whose scripts appear in an image (see also OCR_MAX_READERS);
+    # off by default: in "both" mode it adds a Tesseract confidence pass on Latin-only images
+    OCR_SCRIPT_DETECTION = os.getenv("OCR_SCRIPT_DETECTION", "false").lower() == "true"
+    # Transient OCR failures (out of memory, a timed-out or killed worker) in a background
+    # OCR job are retried up to this many attempts, backing off exponentially; errors
+    # that would repeat, like an unreadable image, are not
+    OCR_MAX_ATTEMPTS = int(os.getenv("OCR_MAX_ATTEMPTS", "3"))
+    OCR_RETRY_BACKOFF_SECONDS = float(os.getenv("OCR_RETRY_BACKOFF_SECONDS", "2"))
+    # Background jobs (local thread pool, state in the jobs table)
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
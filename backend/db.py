@@ -1,3 +1,23 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
 
 db = SQLAlchemy()
+
+
+def ensure_schema():
+    # create_all() never alters existing tables, so add any columns/indexes
+    # introduced after a table was first created (additive only, SQLite-safe)
+    db.create_all()
+    insp = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {c['name'] for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing:
+                continue
+            col_type = col.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}'))
+        db.session.commit()
+        for idx in table.indexes:
+            idx.create(db.engine, checkfirst=True)
@@ -1,5 +1,11 @@
-import io
-from typing import Optional
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional
+
+from ocr import registry
+from ocr.pipeline import DEFAULT_OPTIONS, run_engines
+from ocr.pool import iter_ordered
+from ocr.preprocess import preprocess_array
 
 # PyMuPDF (fitz)
 try:
@@ -10,32 +16,161 @@ except Exception:
 
 # pdfminer.six
 try:
-    from pdfminer.high_level import extract_text as pdfminer_extract_text  # type: ignore
+    from pdfminer.high_level import extract_pages as pdfminer_extract_pages  # type: ignore
+    from pdfminer.layout import LTTextContainer  # type: ignore
+    from pdfminer.pdfpage import PDFPage  # type: ignore
     HAS_PDFMINER = True
 except Exception:
     HAS_PDFMINER = False
 
 
-def extract_with_pymupdf(path: str) -> str:
+def count_pages(path: str) -> int:
+    if HAS_PYMUPDF:
+        with fitz.open(path) as doc:
+            return len(doc)
+    if HAS_PDFMINER:
+        with open(path, "rb") as f:
+            return sum(1 for _ in PDFPage.get_pages(f))
+    return 0
+
+
+def page_ranges(page_count: int, parts: int) -> list[tuple[int, int]]:
+    # Split [0, page_count) into at most `parts` contiguous (start, end) ranges
+    parts = max(1, min(parts, page_count))
+    size, extra = divmod(page_count, parts)
+    ranges, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def iter_pages(
+    path: str, engine: str, pages: Optional[list[int]] = None
+) -> Iterator[tuple[int, str]]:
+    """Yield (page_number, text) one page at a time, 1-based, in order.
+
+    pages restricts extraction to those page numbers.
+    """
+    eng = (engine or "pymupdf").lower()
+    wanted = sorted(set(pages)) if pages is not None else None
+    if eng == "pdfminer":
+        if not HAS_PDFMINER:
+            raise RuntimeError("pdfminer.six not available")
+        zero_based = [n - 1 for n in wanted] if wanted is not None else None
+        layouts = pdfminer_extract_pages(path, page_numbers=zero_based)
+        numbers = wanted if wanted is not None else range(1, 1 << 30)
+        for number, layout in zip(numbers, layouts):
+            yield number, "".join(el.get_text() for el in layout if isinstance(el, LTTextContainer))
+        return
     if not HAS_PYMUPDF:
         raise RuntimeError("PyMuPDF not available")
-    text_parts = []
     with fitz.open(path) as doc:
-        for page in doc:
-            text_parts.append(page.get_text())
-    return "\n".join(text_parts)
+        for number in (wanted if wanted is not None else range(1, len(doc) + 1)):
+            if number <= len(doc):
+                yield number, doc.load_page(number - 1).get_text()
 
 
-def extract_with_pdfminer(path: str) -> str:
-    if not HAS_PDFMINER:
-        raise RuntimeError("pdfminer.six not available")
-    # pdfminer high-level will read the file and return text
-    return pdfminer_extract_text(path) or ""
+def _needs_ocr(page, text: str, min_chars: int) -> bool:
+    # Too little text in the layer, but the page carries images (scans)
+    return len("".join(text.split())) < min_chars and bool(page.get_images())
 
 
-def extract_text(path: str, engine: str) -> str:
-    eng = (engine or "pymupdf").lower()
-    if eng == "pdfminer":
-        return extract_with_pdfminer(path)
-    # default
-    return extract_with_pymupdf(path)
+def ocr_page(page, dpi: int, options: Optional[dict] = None) -> str:
+    """Rasterize a PyMuPDF page and run it through the OCR pipeline."""
+    np = registry.load("numpy")
+    opts = {**DEFAULT_OPTIONS, **(options or {})}
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    merged, _ = run_engines(preprocess_array(gray, opts["preprocess_profile"]), opts)
+    return merged
+
+
+def ocr_pdf_page(path: str, number: int, dpi: int, options: Optional[dict] = None) -> str:
+    # Runs in an OCR pool worker, which opens the document itself
+    with fitz.open(path) as doc:
+        return ocr_page(doc.load_page(number - 1), dpi, options)
+
+
+def iter_page_layers(
+    path: str, engine: str, pages: Optional[list[int]] = None, min_chars: Optional[int] = None
+) -> Iterator[tuple[int, str, bool]]:
+    """iter_pages plus whether each page needs OCR: (page_number, text, needs_ocr).
+
+    With min_chars, pages under it that contain images (scans) need OCR.
+    """
+    if min_chars is None or not HAS_PYMUPDF:
+        for number, text in iter_pages(path, engine, pages):
+            yield number, text, False
+        return
+    with fitz.open(path) as doc:
+        for number, text in iter_pages(path, engine, pages):
+            yield number, text, _needs_ocr(doc.load_page(number - 1), text, min_chars)
+
+
+def _pages_worker(
+    path: str, engine: str, pages: list[int], min_chars: Optional[int]
+) -> list[tuple[int, str, bool]]:
+    # Runs in a worker process; each worker opens its own document
+    return list(iter_page_layers(path, engine, pages, min_chars))
+
+
+def _page_layers(
+    path: str, engine: str, pages: list[int], workers: int, min_chars: Optional[int]
+) -> Iterator[tuple[int, str, bool]]:
+    if workers <= 1 or len(pages) < 2:
+        yield from iter_page_layers(path, engine, pages, min_chars)
+        return
+    chunks = [pages[a:b] for a, b in page_ranges(len(pages), workers * 2)]
+    n = len(chunks)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        for chunk in ex.map(_pages_worker, [path] * n, [engine] * n, chunks, [min_chars] * n):
+            yield from chunk
+
+
+def extract_page_texts(
+    path: str, engine: str, pages: list[int], workers: int = 0, ocr: Optional[dict] = None
+) -> Iterator[tuple[int, str, bool]]:
+    """Text of the given pages, yielded in page order as (page_number, text, ocr_used).
+
+    Text layers are read on `workers` processes when more than one is
+    configured. ocr = {"min_chars", "dpi", "options", "workers", "timeout"}
+    enables the fallback: pages under min_chars that contain images are
+    then rasterized and OCR'd on the shared OCR pool (ocr.pool, warm
+    engines and a per-page timeout), and keep their text layer when OCR
+    finds nothing or fails.
+    """
+    pages = sorted(set(pages))
+    min_chars = ocr["min_chars"] if ocr and HAS_PYMUPDF else None
+    layers = list(_page_layers(path, engine, pages, workers, min_chars))
+    need = [number for number, _, needs_ocr in layers if needs_ocr]
+    outcomes = iter_ordered(
+        ocr_pdf_page,
+        [(path, number, ocr["dpi"], ocr.get("options")) for number in need],
+        workers=ocr.get("workers", 0),
+        timeout=ocr.get("timeout", 120),
+    ) if need else iter(())
+    for number, text, needs_ocr in layers:
+        if not needs_ocr:
+            yield number, text, False
+            continue
+        ok, ocr_text = next(outcomes)
+        if ok and ocr_text.strip():
+            yield number, ocr_text, True
+        else:
+            yield number, text, False
+
+
+def page_fingerprints(path: str) -> Optional[list[str]]:
+    """Per-page content hashes (content streams, geometry, fonts) without
+    extracting text; None when PyMuPDF is unavailable."""
+    if not HAS_PYMUPDF:
+        return None
+    out = []
+    with fitz.open(path) as doc:
+        for page in doc:
+            h = hashlib.sha256(page.read_contents())
+            h.update(repr((tuple(page.rect), page.rotation, page.get_fonts())).encode("utf-8"))
+            out.append(h.hexdigest())
+    return out
@@ -5,8 +5,11 @@ class ExtractedImage(db.Model):
     __tablename__ = 'extracted_images'
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False, index=True)
+    pdf_filename = db.Column(db.String(255), nullable=True, index=True)
     page_number = db.Column(db.Integer, nullable=False)
+    xref = db.Column(db.Integer, nullable=True)  # PDF object id; rows sharing it share one file
     width = db.Column(db.Integer, nullable=False)
     height = db.Column(db.Integer, nullable=False)
     file_path = db.Column(db.String(512), nullable=False)
+    phash = db.Column(db.String(16), nullable=True, index=True)  # 64-bit dHash, hex
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,32 @@
+from datetime import datetime
+from db import db
+
+
+class ExtractedPage(db.Model):
+    __tablename__ = 'extracted_pages'
+    __table_args__ = (
+        db.UniqueConstraint('filename', 'page_number', name='uq_extracted_pages_filename_page'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False, index=True)
+    page_number = db.Column(db.Integer, nullable=False)  # 1-based
+    text = db.Column(db.Text, nullable=False, default='')  # cleaned
+    char_count = db.Column(db.Integer, nullable=False, default=0)
+    has_text_layer = db.Column(db.Boolean, nullable=False, default=False)
+    source = db.Column(db.String(16), nullable=False, default='text')  # 'text' or 'ocr'
+    content_hash = db.Column(db.String(64), nullable=True)  # page content fingerprint
+    # Hybrid OCR config the page was extracted under (None: hybrid OCR off)
+    ocr_config = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    def to_dict(self) -> dict:
+        return {
+            'page_number': self.page_number,
+            'text': self.text,
+            'char_count': self.char_count,
+            'has_text_layer': self.has_text_layer,
+            'source': self.source,
+        }
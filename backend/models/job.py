@@ -0,0 +1,40 @@
+import json
+from datetime import datetime
+from db import db
+
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    kind = db.Column(db.String(32), nullable=False, index=True)
+    # queued/running/succeeded/failed
+    status = db.Column(db.String(16), nullable=False, default='queued', index=True)
+    params_json = db.Column(db.Text, nullable=False, default='{}')
+    progress_json = db.Column(db.Text, nullable=False, default='{}')  # {stage: {done, total}}
+    result_json = db.Column(db.Text, nullable=True)
+    result_status = db.Column(db.Integer, nullable=True)  # HTTP status of the equivalent sync call
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # host:pid of the process that runs (or has queued) the job, and when it
+    # last confirmed it is alive; a stale heartbeat lets another process recover it
+    owner = db.Column(db.String(128), nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        out = {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'params': json.loads(self.params_json or '{}'),
+            'progress': json.loads(self.progress_json or '{}'),
+            'error': self.error,
+            'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
+            'started_at': self.started_at.isoformat() + 'Z' if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() + 'Z' if self.finished_at else None,
+        }
+        if include_result and self.result_json:
+            out['result'] = json.loads(self.result_json)
+            out['result_status'] = self.result_status
+        return out
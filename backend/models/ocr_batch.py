@@ -0,0 +1,50 @@
+import json
+from datetime import datetime
+from db import db
+
+
+class OCRBatch(db.Model):
+    __tablename__ = 'ocr_batches'
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    filename = db.Column(db.String(255), nullable=True, index=True)
+    image_ids_json = db.Column(db.Text, nullable=False, default='[]')  # requested ids, if any
+    force = db.Column(db.Boolean, nullable=False, default=False)
+    # pending/running/done/partial
+    status = db.Column(db.String(16), nullable=False, default='pending', index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self, counts: dict | None = None) -> dict:
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'image_ids': json.loads(self.image_ids_json or '[]'),
+            'force': self.force,
+            'status': self.status,
+            'counts': counts or {},
+            'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() + 'Z' if self.finished_at else None,
+        }
+
+
+class OCRBatchItem(db.Model):
+    __tablename__ = 'ocr_batch_items'
+    __table_args__ = (
+        db.UniqueConstraint('batch_id', 'image_id', name='uq_ocr_batch_items_batch_image'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.String(32), db.ForeignKey('ocr_batches.id'), nullable=False, index=True)
+    image_id = db.Column(db.Integer, nullable=False)  # extracted_images.id
+    position = db.Column(db.Integer, nullable=False)  # order in the response
+    # pending/done/failed/skipped
+    status = db.Column(db.String(16), nullable=False, default='pending', index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)  # backoff for failed items
+    ocr_id = db.Column(db.Integer, nullable=True)  # ocr_extracted_data.id holding the result
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
@@ -1,12 +1,38 @@
+import json
 from datetime import datetime
 from db import db
 
 
 class OCRExtracted(db.Model):
     __tablename__ = 'ocr_extracted_data'
+    __table_args__ = (
+        db.Index('ix_ocr_extracted_content_config', 'content_hash', 'config_hash'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     image_name = db.Column(db.String(255), nullable=False)
     category = db.Column(db.String(64), nullable=True)
     extracted_text = db.Column(db.Text, nullable=True)
     structured_json = db.Column(db.Text, nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)  # sha256 of image bytes
+    phash = db.Column(db.String(16), nullable=True)  # dHash, for near-duplicate reuse
+    config_hash = db.Column(db.String(64), nullable=True)  # engines/langs/preprocess fingerprint
+    engines = db.Column(db.String(64), nullable=True)  # engines that actually ran, comma-separated
+    skip_reason = db.Column(db.String(32), nullable=True)  # set when the prefilter skipped OCR
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_payload(self, image_name: str | None = None) -> dict:
+        # Rebuild the build_structured() payload from the stored row
+        try:
+            details = json.loads(self.structured_json or '{}')
+        except Exception:
+            details = {}
+        payload = {
+            'image': image_name or self.image_name,
+            'category': self.category,
+            'details': details,
+            'raw_text': self.extracted_text or '',
+            'engines': [e for e in (self.engines or '').split(',') if e],
+        }
+        if self.skip_reason:
+            payload['skip_reason'] = self.skip_reason
+        return payload
@@ -5,4 +5,6 @@ class PDFUpload(db.Model):
     filename = db.Column(db.String(120), nullable=False)
     size = db.Column(db.Float)
     path = db.Column(db.String(255))
+    # Hex SHA-256 of the file; one upload per distinct content
+    sha256 = db.Column(db.String(64), unique=True, index=True, nullable=True)
     upload_date = db.Column(db.DateTime, default=db.func.current_timestamp())
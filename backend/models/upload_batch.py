@@ -0,0 +1,15 @@
+import json
+from datetime import datetime
+from db import db
+
+
+class UploadBatch(db.Model):
+    __tablename__ = 'upload_batches'
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    # Per-file entries, with {kind: job_id} if queued
+    files_json = db.Column(db.Text, nullable=False, default='[]')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    @property
+    def files(self) -> list[dict]:
+        return json.loads(self.files_json or '[]')
@@ -0,0 +1,28 @@
+from datetime import datetime
+from db import db
+
+
+class UploadSession(db.Model):
+    __tablename__ = 'upload_sessions'
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    filename = db.Column(db.String(120), nullable=False)  # name requested by the client
+    size = db.Column(db.Integer, nullable=True)  # declared total bytes, if known
+    offset = db.Column(db.Integer, nullable=False, default=0)  # bytes received so far
+    # open/writing/complete
+    status = db.Column(db.String(16), nullable=False, default='open', index=True)
+    upload_id = db.Column(db.Integer, nullable=True)  # pdf_upload.id once finalized
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    def to_dict(self) -> dict:
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.offset,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() + 'Z' if self.updated_at else None,
+        }
@@ -1,26 +1,232 @@
-import pytesseract
-import easyocr
-import numpy as np
-from .utils import get_ocr_langs
+from __future__ import annotations
 
-_reader = None
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
 
+from . import registry
+from .utils import get_max_readers, get_ocr_langs
 
-def _get_reader():
-    global _reader
-    if _reader is None:
-        langs = get_ocr_langs()
-        _reader = easyocr.Reader(langs, gpu=False)
-    return _reader
+if TYPE_CHECKING:
+    import numpy as np
 
+# Engines run by the OCR route, in order; part of the OCR cache fingerprint
+DEFAULT_ENGINES = ["pytesseract", "easyocr"]
 
-def ocr_pytesseract(image: np.ndarray) -> str:
-    return pytesseract.image_to_string(image)
+# EasyOCR readers keyed by language tuple, least recently used first
+_readers: OrderedDict = OrderedDict()
+_readers_lock = threading.Lock()
+# Extra readers per language set for callers running readtext concurrently
+# (tiles), and the ids of readers currently checked out by such callers
+_spare_readers: dict = {}
+_in_use: set = set()
+_tess_local = threading.local()
 
 
-def ocr_easyocr(image: np.ndarray) -> str:
-    reader = _get_reader()
+def _get_reader(langs: list[str] | None = None):
+    # Each language set loads its own models, so at most get_max_readers()
+    # stay resident; the least recently used one is dropped beyond that
+    key = tuple(langs or get_ocr_langs())
+    with _readers_lock:
+        reader = _readers.get(key)
+        if reader is not None:
+            _readers.move_to_end(key)
+            return reader
+        reader = registry.load("easyocr").Reader(list(key), gpu=False)
+        _readers[key] = reader
+        while len(_readers) > get_max_readers():
+            evicted, _ = _readers.popitem(last=False)
+            _spare_readers.pop(evicted, None)
+        return reader
+
+
+@contextmanager
+def checkout_reader(langs: list[str] | None = None):
+    """Exclusive use of an EasyOCR reader for langs.
+
+    readtext is not re-entrant, so concurrent callers each need their own
+    reader. The resident reader is handed out first; when it is busy an
+    extra one is built and kept for the next concurrent caller, so there
+    are at most as many per language set as callers ever ran at once.
+    """
+    key = tuple(langs or get_ocr_langs())
+    primary = _get_reader(langs)
+    with _readers_lock:
+        idle = [r for r in [primary, *_spare_readers.get(key, [])] if id(r) not in _in_use]
+        reader = idle[0] if idle else None
+        if reader is not None:
+            _in_use.add(id(reader))
+    if reader is None:
+        # Built outside the lock: loading models takes seconds
+        reader = registry.load("easyocr").Reader(list(key), gpu=False)
+        with _readers_lock:
+            _spare_readers.setdefault(key, []).append(reader)
+            _in_use.add(id(reader))
+    try:
+        yield reader
+    finally:
+        with _readers_lock:
+            _in_use.discard(id(reader))
+
+
+def warm_up(engines=DEFAULT_ENGINES):
+    # Import engines and build the EasyOCR reader ahead of the first image
+    for name in engines:
+        registry.load(name)
+    if "easyocr" in engines:
+        _get_reader()
+
+
+def resolve_tesseract_backend(backend: str) -> str:
+    # tesserocr keeps a loaded Tesseract API in-process (no fork/temp PNG per call)
+    if backend == "tesserocr" and registry.available("tesserocr"):
+        return "tesserocr"
+    return "pytesseract"
+
+
+def _get_tess_api(lang: str):
+    # One API per thread (tesserocr instances are not thread-safe); pool
+    # workers are single-threaded, so this is one per worker process
+    apis = getattr(_tess_local, "apis", None)
+    if apis is None:
+        apis = _tess_local.apis = {}
+    if lang not in apis:
+        apis[lang] = registry.load("tesserocr").PyTessBaseAPI(lang=lang)
+    return apis[lang]
+
+
+def _tesserocr_api(image: np.ndarray, lang: str | None):
+    try:
+        api = _get_tess_api(lang or "eng")
+    except Exception:
+        return None
+    # Hand the raw pixel buffer to Tesseract, no PNG round trip
+    np = registry.load("numpy")
+    img = np.ascontiguousarray(image, dtype=np.uint8)
+    h, w = img.shape[:2]
+    bpp = 1 if img.ndim == 2 else img.shape[2]
+    api.SetImageBytes(img.tobytes(), w, h, bpp, w * bpp)
+    return api
+
+
+def ocr_pytesseract(
+    image: np.ndarray, backend: str = "pytesseract", lang: str | None = None
+) -> tuple[str, str]:
+    # (text, backend that produced it); tesserocr falls back to pytesseract
+    # when its API cannot be created
+    if backend == "tesserocr":
+        api = _tesserocr_api(image, lang)
+        if api is not None:
+            return api.GetUTF8Text(), "tesserocr"
+    pytesseract = registry.load("pytesseract")
+    if lang:
+        return pytesseract.image_to_string(image, lang=lang), "pytesseract"
+    return pytesseract.image_to_string(image), "pytesseract"
+
+
+def ocr_pytesseract_data(
+    image: np.ndarray, backend: str = "pytesseract", lang: str | None = None
+) -> tuple[str, float, str]:
+    # Text, mean word confidence (0-100) and the backend actually used
+    if backend == "tesserocr":
+        api = _tesserocr_api(image, lang)
+        if api is not None:
+            text = api.GetUTF8Text()
+            confs = [c for c in api.AllWordConfidences() if c >= 0]
+            return text, (sum(confs) / len(confs) if confs else 0.0), "tesserocr"
+
+    pytesseract = registry.load("pytesseract")
+    kwargs = {"lang": lang} if lang else {}
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT, **kwargs)
+    lines: dict = {}
+    confs = []
+    for i, word in enumerate(data.get("text", [])):
+        word = (word or "").strip()
+        conf = float(data["conf"][i])
+        if not word or conf < 0:
+            continue
+        confs.append(conf)
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+    text = "\n".join(" ".join(words) for words in lines.values())
+    mean_conf = sum(confs) / len(confs) if confs else 0.0
+    return text, mean_conf, "pytesseract"
+
+
+def ocr_pytesseract_lines(
+    image: np.ndarray, lang: str | None = None
+) -> list[tuple[float, float, str, float]]:
+    """Tesseract lines as (center_x, center_y, text, mean_conf) in image pixels."""
+    pytesseract = registry.load("pytesseract")
+    kwargs = {"lang": lang} if lang else {}
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT, **kwargs)
+    lines: dict = {}  # (block, par, line) -> [words, confs, left, top, right, bottom]
+    for i, word in enumerate(data.get("text", [])):
+        word = (word or "").strip()
+        conf = float(data["conf"][i])
+        if not word or conf < 0:
+            continue
+        left, top = data["left"][i], data["top"][i]
+        right, bottom = left + data["width"][i], top + data["height"][i]
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        entry = lines.get(key)
+        if entry is None:
+            lines[key] = [[word], [conf], left, top, right, bottom]
+            continue
+        entry[0].append(word)
+        entry[1].append(conf)
+        entry[2:] = [
+            min(entry[2], left), min(entry[3], top), max(entry[4], right), max(entry[5], bottom)
+        ]
+    return [
+        ((l + r) / 2, (t + b) / 2, " ".join(words), sum(confs) / len(confs))
+        for words, confs, l, t, r, b in lines.values()
+    ]
+
+
+def ocr_easyocr_lines(
+    image: np.ndarray, langs: list[str] | None = None, reader=None
+) -> list[tuple[float, float, str]]:
+    """EasyOCR detections as (center_x, center_y, text) in image pixels;
+    reader overrides the shared one (see checkout_reader)."""
+    out = []
+    for r in (reader or _get_reader(langs)).readtext(image):
+        if len(r) < 2:
+            continue
+        xs = [float(p[0]) for p in r[0]]
+        ys = [float(p[1]) for p in r[0]]
+        out.append(((min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2, r[1]))
+    return out
+
+
+def ocr_easyocr(image: np.ndarray, langs: list[str] | None = None) -> str:
+    reader = _get_reader(langs)
     result = reader.readtext(image)
     # result is list of (bbox, text, conf)
     lines = [r[1] for r in result if len(r) > 1]
     return "\n".join(lines)
+
+
+def _pad_to(image: np.ndarray, h: int, w: int) -> np.ndarray:
+    # Pad bottom/right with white so box coordinates are unchanged
+    ph, pw = h - image.shape[0], w - image.shape[1]
+    if ph == 0 and pw == 0:
+        return image
+    pad = ((0, ph), (0, pw)) + ((0, 0),) * (image.ndim - 2)
+    return registry.load("numpy").pad(image, pad, mode="constant", constant_values=255)
+
+
+def ocr_easyocr_batch(
+    images: list[np.ndarray], batch_size: int = 8, langs: list[str] | None = None
+) -> list[str]:
+    # readtext_batched needs equal-sized inputs, so pad to the largest; callers
+    # should group images of similar size to keep the padding small
+    if not images:
+        return []
+    reader = _get_reader(langs)
+    h = max(img.shape[0] for img in images)
+    w = max(img.shape[1] for img in images)
+    padded = [_pad_to(img, h, w) for img in images]
+    results = reader.readtext_batched(padded, batch_size=batch_size)
+    return ["\n".join(r[1] for r in res if len(r) > 1) for res in results]
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import io
+import itertools
+import math
+import struct
+import zlib
+from typing import TYPE_CHECKING, Iterator
+
+from PIL import Image
+
+from . import registry
+
+if TYPE_CHECKING:
+    import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # colour type -> samples per pixel
+# Rough bytes held per pixel of a PNG strip (RGBA worst case): inflated
+# rows, the stored re-wrap, Pillow's decoded and cropped copies and the
+# grayscale result
+_PNG_STRIP_BYTES_PER_PIXEL = 20
+_JPEG_SCALES = (1, 2, 4, 8)  # libjpeg can decode at these reductions
+
+
+def _png_chunk(ctype: bytes, data: bytes) -> bytes:
+    crc = zlib.crc32(ctype + data) & 0xFFFFFFFF
+    return struct.pack(">I", len(data)) + ctype + data + struct.pack(">I", crc)
+
+
+def iter_png_strips(path: str, rows: int) -> Iterator[tuple[int, Image.Image]]:
+    """Decode a non-interlaced 8-bit PNG rows at a time; yields (y0, strip).
+
+    The inflated rows of each strip are re-wrapped as a small stored PNG
+    whose first row is the previous strip's last row, written unfiltered,
+    so filters that refer to the row above still decode. Only one strip is
+    held in memory. Raises ValueError (before yielding) for other layouts.
+    """
+    with open(path, "rb") as f:
+        if f.read(8) != PNG_SIGNATURE:
+            raise ValueError(f"Not a PNG: {path}")
+        header = None
+        extra = []  # PLTE/tRNS, needed to decode each strip
+        inflate = zlib.decompressobj()
+        buf = bytearray()
+        prev = None  # raw bytes of the last decoded row
+        y = 0
+
+        def emit(n: int) -> tuple[int, Image.Image]:
+            nonlocal prev, y
+            stored = zlib.compressobj(0)
+            idat = b"".join([
+                stored.compress(b"\x00" + prev) if prev is not None else b"",
+                stored.compress(memoryview(buf)[: n * stride]),
+                stored.flush(),
+            ])
+            del buf[: n * stride]
+            total = n + (prev is not None)
+            ihdr = struct.pack(">II", width, total) + header[8:]
+            png = b"".join([
+                PNG_SIGNATURE,
+                _png_chunk(b"IHDR", ihdr),
+                *extra,
+                _png_chunk(b"IDAT", idat),
+                _png_chunk(b"IEND", b""),
+            ])
+            del idat
+            img = Image.open(io.BytesIO(png))
+            img.load()
+            prev = img.crop((0, total - 1, width, total)).tobytes()
+            if total > n:
+                img = img.crop((0, 1, width, total))
+            y0, y = y, y + n
+            return y0, img
+
+        while True:
+            head = f.read(8)
+            if len(head) < 8:
+                break
+            length, ctype = struct.unpack(">I4s", head)
+            data = f.read(length)
+            f.read(4)  # CRC
+            if ctype == b"IHDR":
+                width, _, depth, colour, _, _, interlace = struct.unpack(">IIBBBBB", data)
+                if depth != 8 or interlace or colour not in _PNG_CHANNELS:
+                    raise ValueError(f"Unsupported PNG layout: {path}")
+                stride = width * _PNG_CHANNELS[colour] + 1
+                header = data
+            elif ctype in (b"PLTE", b"tRNS"):
+                extra.append(_png_chunk(ctype, data))
+            elif ctype == b"IDAT":
+                # Inflate in bounded pieces; a small chunk can expand a lot
+                pending = data
+                while pending:
+                    buf += inflate.decompress(pending, stride * rows)
+                    pending = inflate.unconsumed_tail
+                    while len(buf) >= stride * rows:
+                        yield emit(rows)
+            elif ctype == b"IEND":
+                break
+        buf += inflate.flush()
+        if len(buf) >= stride:
+            yield emit(len(buf) // stride)
+
+
+def gray_strips(
+    path: str, max_bytes: int, scale: float = 1.0
+) -> tuple[tuple[int, int], Iterator[tuple[int, np.ndarray]]]:
+    """((h, w), strips) of a grayscale decode of path, holding about max_bytes.
+
+    8-bit non-interlaced PNGs are decoded strip by strip at full size.
+    JPEGs are decoded straight to grayscale, at 1/2, 1/4 or 1/8 size when
+    the frame would not fit (or scale asks for less). Anything else is
+    decoded whole. (h, w) is the size of the decoded image.
+    """
+    np = registry.load("numpy")
+    with Image.open(path) as im:
+        w, h = im.size
+        fmt = im.format
+        png_ok = im.mode in ("L", "LA", "RGB", "RGBA", "P") and not im.info.get("interlace")
+    if fmt == "PNG" and png_ok:
+        rows = max(1, max_bytes // (w * _PNG_STRIP_BYTES_PER_PIXEL))
+        strips = iter_png_strips(path, rows)
+        try:
+            first = next(strips)  # layout errors surface here, before any pixels are used
+        except ValueError:
+            pass  # e.g. 1/2/4-bit palette or interlaced: decode whole below
+        else:
+            chained = itertools.chain([first], strips)
+            return (h, w), ((y, np.asarray(s.convert("L"))) for y, s in chained)
+    if fmt == "JPEG":
+        fit = next((r for r in _JPEG_SCALES if (w / r) * (h / r) <= max_bytes), _JPEG_SCALES[-1])
+        target = max((r for r in _JPEG_SCALES if r <= 1.0 / scale), default=1)
+        r = max(fit, target)
+        im = Image.open(path)
+        im.draft("L", (math.ceil(w / r), math.ceil(h / r)))
+        gray = np.asarray(im.convert("L"))
+        im.close()
+        return gray.shape[:2], iter([(0, gray)])
+    cv2 = registry.load("cv2")
+    gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise ValueError(f"Failed to read image: {path}")
+    return gray.shape[:2], iter([(0, gray)])
+
+
+def read_gray(path: str, max_side: int, max_bytes: int = 16 * 1024 * 1024) -> np.ndarray:
+    """Grayscale copy of path at most max_side on its longest side, decoded
+    in strips (see gray_strips) so a poster-size image is never held whole."""
+    cv2 = registry.load("cv2")
+    np = registry.load("numpy")
+    with Image.open(path) as im:
+        w, h = im.size
+    scale = min(1.0, max_side / float(max(h, w)))
+    (decoded_h, _), strips = gray_strips(path, max_bytes, scale)
+    out_w = max(1, round(w * scale))
+    parts = []
+    for y, strip in strips:
+        sh, sw = strip.shape[:2]
+        # Output rows by cumulative rounding, so strip seams do not drift
+        ratio = out_w / float(sw)
+        out_h = round((y + sh) * ratio) - round(y * ratio)
+        if out_h < 1 and (parts or y + sh < decoded_h):
+            continue
+        out_h = max(out_h, 1)
+        if (out_w, out_h) != (sw, sh):
+            strip = cv2.resize(strip, (out_w, out_h), interpolation=cv2.INTER_AREA)
+        parts.append(strip)
+    return np.vstack(parts) if len(parts) > 1 else parts[0]
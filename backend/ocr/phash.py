@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import threading
+from typing import IO, Any, Union
+
+from PIL import Image, ImageChops
+
+HASH_SIZE = 8  # 8x8 gradient bits -> 64-bit hash, 16 hex chars
+# confirm_near: images are compared at this width after their aspect ratios agree
+CONFIRM_WIDTH = 128
+CONFIRM_PARAMS = {"max_aspect_diff": 0.05, "pixel_delta": 64, "max_changed": 0.1}
+
+
+def dhash(src: Union[str, IO[bytes], Image.Image]) -> str:
+    """64-bit difference hash (horizontal gradients of a 9x8 grayscale thumbnail), as hex.
+
+    Insensitive to resolution and re-encoding, so the same picture at
+    different sizes or qualities lands within a few bits.
+    """
+    img = src if isinstance(src, Image.Image) else Image.open(src)
+    # Let JPEG decode at reduced scale; a 9x8 thumbnail needs nothing more
+    img.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+    small = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    px = list(small.getdata())
+    bits = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = px[row * (HASH_SIZE + 1) + col]
+            right = px[row * (HASH_SIZE + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+
+def confirm_near(a: Union[str, Image.Image], b: Union[str, Image.Image]) -> bool:
+    """Pixel-level check that two hash-near images really show the same thing.
+
+    A 64-bit dHash of text on a plain background mostly captures layout, so
+    different banners can hash alike. The aspect ratios must agree, and at
+    CONFIRM_WIDTH px the pixels that changed noticeably must be a small
+    fraction of the ink (dark pixels) in either image.
+    """
+    x = a if isinstance(a, Image.Image) else Image.open(a)
+    y = b if isinstance(b, Image.Image) else Image.open(b)
+    ax, ay = x.width / x.height, y.width / y.height
+    if abs(ax - ay) / ax > CONFIRM_PARAMS["max_aspect_diff"]:
+        return False
+    size = (CONFIRM_WIDTH, max(8, round(CONFIRM_WIDTH / ax)))
+    for img in (x, y):
+        img.draft("L", size)
+    x = x.convert("L").resize(size, Image.BILINEAR)
+    y = y.convert("L").resize(size, Image.BILINEAR)
+    delta = CONFIRM_PARAMS["pixel_delta"]
+    changed = ImageChops.difference(x, y).point(lambda v: 255 if v > delta else 0).histogram()[255]
+    ink = ImageChops.darker(x, y).point(lambda v: 255 if v < 128 else 0).histogram()[255]
+    return changed <= CONFIRM_PARAMS["max_changed"] * max(ink, 1)
+
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over hex hashes under Hamming distance.
+
+    search() only descends into children whose edge distance is within
+    max_distance of the query's distance to the node (triangle inequality).
+    """
+
+    def __init__(self):
+        self._root: list | None = None  # [hash, values, {distance: child}]
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def add(self, h: str, value: Any):
+        with self._lock:
+            self.size += 1
+            if self._root is None:
+                self._root = [h, [value], {}]
+                return
+            node = self._root
+            while True:
+                d = hamming(h, node[0])
+                if d == 0:
+                    node[1].append(value)
+                    return
+                child = node[2].get(d)
+                if child is None:
+                    node[2][d] = [h, [value], {}]
+                    return
+                node = child
+
+    def search(self, h: str, max_distance: int) -> list[tuple[int, Any]]:
+        """(distance, value) pairs within max_distance, nearest first."""
+        out = []
+        with self._lock:
+            stack = [self._root] if self._root is not None else []
+            while stack:
+                node = stack.pop()
+                d = hamming(h, node[0])
+                if d <= max_distance:
+                    out.extend((d, v) for v in node[1])
+                for edge, child in node[2].items():
+                    if d - max_distance <= edge <= d + max_distance:
+                        stack.append(child)
+        out.sort(key=lambda item: item[0])
+        return out
@@ -0,0 +1,238 @@
+from .preprocess import preprocess_cached
+from .engines import (
+    ocr_pytesseract,
+    ocr_pytesseract_data,
+    ocr_easyocr,
+    ocr_easyocr_batch,
+    resolve_tesseract_backend,
+)
+from .extract import merge_texts, build_structured
+from .scripts import choose_langs, needs_confidence
+from .utils import get_ocr_langs
+from .prefilter import should_ocr, SKIP_CATEGORIES
+from .tiling import image_size, ocr_tiled
+
+# mode "both" always runs Tesseract and EasyOCR; "cascade" only falls back to
+# EasyOCR when Tesseract's mean confidence or character yield is too low
+DEFAULT_OPTIONS = {
+    "mode": "both",
+    "cascade_min_conf": 60.0,
+    "cascade_min_chars": 20,
+    # "pytesseract" (subprocess per call) or "tesserocr" (in-process API,
+    # falls back to pytesseract when the bindings are unavailable)
+    "tesseract_backend": "pytesseract",
+    "tesseract_lang": None,
+    # >1 sends EasyOCR work for a group of similar-sized images through
+    # readtext_batched; 1 keeps one readtext call per image
+    "easyocr_batch_size": 1,
+    # Skip OCR for icons, strips and images whose text-likelihood score
+    # (ocr.prefilter) is below prefilter_min_score
+    "prefilter": False,
+    "prefilter_min_score": 0.35,
+    # "auto" picks fast/balanced/heavy per image from noise and contrast
+    "preprocess_profile": "auto",
+    # Size cap of the processed/ cache (LRU-evicted; 0 = unbounded)
+    "preprocess_cache_mb": 1024,
+    # Images above tile_min_pixels are OCR'd in overlapping tiles on
+    # tile_workers threads, keeping the working set near tile_memory_mb
+    "tile_min_pixels": 16_000_000,
+    "tile_size": 2048,
+    "tile_overlap": 192,
+    "tile_memory_mb": 512,
+    "tile_workers": 2,
+    # Pick EasyOCR languages per image from the scripts in Tesseract's
+    # reading, so Latin-only images use a Latin-only reader (in "both" mode
+    # this costs an extra image_to_data pass on Latin-only images)
+    "script_detection": False,
+}
+
+# Failures that may not recur on a later attempt
+TRANSIENT_ERRORS = (MemoryError,)
+
+
+def easyocr_langs(text: str, conf: float, opts: dict) -> list[str] | None:
+    # EasyOCR languages for an image from its Tesseract reading; None = all configured
+    if not opts["script_detection"]:
+        return None
+    return choose_langs(text, conf, get_ocr_langs(), opts["cascade_min_conf"])
+
+
+def _tesseract_pass(img, opts: dict) -> tuple[str, bool, str, list[str] | None]:
+    """Returns (tesseract_text, needs_easyocr, tesseract_backend, easyocr_langs).
+
+    tesseract_backend is the backend that actually ran, which is
+    pytesseract when tesserocr was asked for but its API failed to load.
+    """
+    tess = {
+        "backend": resolve_tesseract_backend(opts["tesseract_backend"]),
+        "lang": opts["tesseract_lang"],
+    }
+    if opts["mode"] != "cascade":
+        # The text is always image_to_string's; script detection adds an
+        # image_to_data pass, for its confidence only, when choose_langs needs it
+        t1, tess_backend = ocr_pytesseract(img, **tess)
+        if not opts["script_detection"]:
+            return t1, True, tess_backend, None
+        conf = ocr_pytesseract_data(img, **tess)[1] if needs_confidence(t1) else 0.0
+        return t1, True, tess_backend, easyocr_langs(t1, conf, opts)
+
+    t1, conf, tess_backend = ocr_pytesseract_data(img, **tess)
+    langs = easyocr_langs(t1, conf, opts)
+    chars = len("".join(t1.split()))
+    confident = conf >= opts["cascade_min_conf"] and chars >= opts["cascade_min_chars"]
+    return t1, not confident, tess_backend, langs
+
+
+def run_engines(img, options: dict | None = None) -> tuple[str, list[str]]:
+    """OCR a preprocessed image; returns (merged_text, engines_run)."""
+    opts = {**DEFAULT_OPTIONS, **(options or {})}
+    t1, needs_easyocr, tess_backend, langs = _tesseract_pass(img, opts)
+    if not needs_easyocr:
+        return merge_texts(t1, ""), [tess_backend]
+    t2 = ocr_easyocr(img, langs)
+    return merge_texts(t1, t2), [tess_backend, "easyocr"]
+
+
+def _load_preprocessed(in_path: str, images_root: str, opts: dict):
+    return preprocess_cached(
+        in_path, images_root, opts["preprocess_profile"],
+        int(opts["preprocess_cache_mb"]) * 1024 * 1024,
+    )
+
+
+def _prefilter(in_path: str, image_name: str, opts: dict) -> dict | None:
+    # Payload for an image that should skip OCR, or None to OCR it
+    if not opts["prefilter"]:
+        return None
+    run, reason, _ = should_ocr(in_path, opts["prefilter_min_score"])
+    if run:
+        return None
+    return {
+        "image": image_name,
+        "category": SKIP_CATEGORIES[reason],
+        "details": {},
+        "raw_text": "",
+        "engines": [],
+        "skip_reason": reason,
+    }
+
+
+def _is_large(in_path: str, opts: dict) -> bool:
+    h, w = image_size(in_path)
+    return h * w > opts["tile_min_pixels"]
+
+
+def _error(image_name: str, e: Exception) -> dict:
+    # transient marks failures worth retrying (resource exhaustion); the
+    # rest, e.g. an unreadable image or a missing tesseract binary, would
+    # fail the same way again
+    return {"image": image_name, "error": str(e), "transient": isinstance(e, TRANSIENT_ERRORS)}
+
+
+def _payload(image_name: str, merged: str, engines: list[str]) -> dict:
+    payload = build_structured(image_name, merged)
+    payload["engines"] = engines
+    return payload
+
+
+def process_image(
+    in_path: str, images_root: str, image_name: str, options: dict | None = None
+) -> dict:
+    # Full per-image OCR pass; runs inside pool workers, so no DB/app access here
+    opts = {**DEFAULT_OPTIONS, **(options or {})}
+    # Header-only size check first; the prefilter and tiling both decode reduced/in strips
+    large = _is_large(in_path, opts)
+    skipped = _prefilter(in_path, image_name, opts)
+    if skipped:
+        return skipped
+    if large:
+        return _payload(image_name, *ocr_tiled(in_path, opts))
+    img = _load_preprocessed(in_path, images_root, opts)
+    merged, engines = run_engines(img, opts)
+    return _payload(image_name, merged, engines)
+
+
+def process_group(
+    items: list[tuple[str, str]], images_root: str, options: dict | None = None
+) -> list[dict]:
+    """OCR a group of (in_path, image_name); one payload, or {"error", "transient"},
+    per item, in order.
+
+    With easyocr_batch_size > 1 the EasyOCR pass for the whole group goes
+    through one batched call.
+    """
+    opts = {**DEFAULT_OPTIONS, **(options or {})}
+    batch_size = int(opts["easyocr_batch_size"])
+    if batch_size <= 1 or len(items) == 1:
+        out = []
+        for in_path, name in items:
+            try:
+                out.append(process_image(in_path, images_root, name, opts))
+            except Exception as e:
+                out.append(_error(name, e))
+        return out
+
+    firsts = []  # (image, tesseract_text, needs_easyocr, backend), finished payload or exception
+    for in_path, name in items:
+        try:
+            large = _is_large(in_path, opts)
+            skipped = _prefilter(in_path, name, opts)
+            if skipped:
+                firsts.append(skipped)
+                continue
+            if large:
+                firsts.append(_payload(name, *ocr_tiled(in_path, opts)))
+                continue
+            img = _load_preprocessed(in_path, images_root, opts)
+            firsts.append((img, *_tesseract_pass(img, opts)))
+        except Exception as e:
+            firsts.append(e)
+
+    # One batched call per EasyOCR language set in the group
+    by_langs: dict = {}
+    for k, f in enumerate(firsts):
+        if isinstance(f, tuple) and f[2]:
+            by_langs.setdefault(tuple(f[4] or ()), []).append(k)
+    easy = {}
+    for langs, need in by_langs.items():
+        langs = list(langs) or None
+        try:
+            texts = ocr_easyocr_batch([firsts[k][0] for k in need], batch_size, langs)
+            easy.update(zip(need, texts))
+        except Exception:
+            # Fall back to per-image calls rather than failing the whole group
+            easy.update((k, ocr_easyocr(firsts[k][0], langs)) for k in need)
+
+    out = []
+    for k, ((_, name), first) in enumerate(zip(items, firsts)):
+        if isinstance(first, Exception):
+            out.append(_error(name, first))
+            continue
+        if isinstance(first, dict):
+            out.append(first)
+            continue
+        _, t1, needs_easyocr, tess_backend, _ = first
+        if needs_easyocr:
+            out.append(_payload(name, merge_texts(t1, easy[k]), [tess_backend, "easyocr"]))
+        else:
+            out.append(_payload(name, merge_texts(t1, ""), [tess_backend]))
+    return out
+
+
+def group_by_size(
+    sizes: list[tuple[int, int]], batch_size: int, tolerance: int = 128
+) -> list[list[int]]:
+    """Split indices into groups of at most batch_size whose (h, w) are within
+    tolerance px of the group's first member, so padding to a common size stays small."""
+    if batch_size <= 1:
+        return [[i] for i in range(len(sizes))]
+    groups: list[list[int]] = []
+    for i in sorted(range(len(sizes)), key=lambda k: sizes[k]):
+        h, w = sizes[i]
+        if groups:
+            h0, w0 = sizes[groups[-1][0]]
+            if len(groups[-1]) < batch_size and h - h0 <= tolerance and abs(w - w0) <= tolerance:
+                groups[-1].append(i)
+                continue
+        groups.append([i])
+    return groups
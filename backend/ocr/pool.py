@@ -0,0 +1,171 @@
+import itertools
+import os
+import queue
+import threading
+import time
+import multiprocessing as mp
+from multiprocessing.pool import Pool
+from typing import Any, Callable, Iterator, Sequence
+
+_pool: Pool | None = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+# Workers report (task_id, start time, pid) here, so a task's timeout runs
+# from when it started rather than from when the caller began waiting for
+# it, and a task whose worker died (e.g. killed out of memory) is noticed
+# without waiting out the timeout
+_started_queue = None
+_started_at: dict[int, tuple[float, int]] = {}
+_waiting: set[int] = set()
+_task_lock = threading.Lock()
+_task_ids = itertools.count()
+
+_POLL_SECONDS = 1.0
+# Extra wait past the timeout for the worker's own watchdog to fire
+_GRACE_SECONDS = 2.0
+
+
+class WorkerLost(RuntimeError):
+    """The worker running a task exited before returning a result."""
+
+
+# Failures of the task's process rather than of its input; a retry may succeed
+LOST_TASK_ERRORS = (TimeoutError, WorkerLost)
+
+
+def _init_worker(started_queue=None):
+    global _started_queue
+    _started_queue = started_queue
+    # Import engines and build the EasyOCR reader once per worker so images
+    # don't pay model load
+    from .engines import warm_up
+    try:
+        warm_up()
+    except Exception:
+        pass
+
+
+def _run_task(task_id: int, fn: Callable, args: tuple, timeout: float):
+    # Runs in a worker. A task past its timeout takes down only its own
+    # worker (os._exit from a watchdog thread works even inside C code);
+    # the pool starts a replacement and other callers' tasks are untouched.
+    if _started_queue is not None:
+        _started_queue.put((task_id, time.time(), os.getpid()))
+    watchdog = threading.Timer(timeout, os._exit, (1,))
+    watchdog.daemon = True
+    watchdog.start()
+    try:
+        return fn(*args)
+    finally:
+        watchdog.cancel()
+
+
+def get_pool(workers: int) -> Pool:
+    global _pool, _pool_size, _started_queue
+    with _pool_lock:
+        if _pool is None or _pool_size != workers:
+            _shutdown_locked()
+            _started_queue = mp.Queue()
+            _pool = mp.Pool(processes=workers, initializer=_init_worker, initargs=(_started_queue,))
+            _pool_size = workers
+        return _pool
+
+
+def prestart(workers: int):
+    """Optional warm-up: start the pool (its initializer loads the engines) or,
+    without a pool, warm the engines in this process on a background thread."""
+    if workers > 0:
+        get_pool(workers)
+        return
+    from .engines import warm_up
+    threading.Thread(target=warm_up, name='ocr-warmup', daemon=True).start()
+
+
+def _shutdown_locked():
+    global _pool, _pool_size
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+    _pool = None
+    _pool_size = 0
+
+
+def shutdown_pool():
+    with _pool_lock:
+        _shutdown_locked()
+
+
+def _started(task_id: int) -> tuple[float, int] | None:
+    # Drain start reports into _started_at (keeping only tasks still awaited)
+    with _task_lock:
+        while _started_queue is not None:
+            try:
+                tid, started, pid = _started_queue.get_nowait()
+            except queue.Empty:
+                break
+            if tid in _waiting:
+                _started_at[tid] = (started, pid)
+        return _started_at.get(task_id)
+
+
+def _alive(pid: int) -> bool:
+    # The pool reaps exited workers within a fraction of a second
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _wait(res, task_id: int, timeout: float) -> tuple[bool, Any]:
+    while True:
+        try:
+            return True, res.get(timeout=_POLL_SECONDS)
+        except mp.TimeoutError:
+            started = _started(task_id)
+            if started is None:
+                continue
+            if time.time() - started[0] > timeout + _GRACE_SECONDS:
+                return False, TimeoutError(f"OCR exceeded {timeout}s")
+            if not _alive(started[1]) and not res.ready():
+                return False, WorkerLost("OCR worker exited before finishing")
+        except Exception as e:
+            return False, e
+
+
+def iter_ordered(
+    fn: Callable, args_list: Sequence[tuple], workers: int, timeout: float
+) -> Iterator[tuple[bool, Any]]:
+    """Run fn(*args) for each entry and yield (ok, result_or_exception) in input order.
+
+    The pool is shared by concurrent callers; a timed-out task only costs its
+    own worker. workers <= 0 runs serially in the calling process (no
+    timeout enforcement).
+    """
+    if workers <= 0:
+        for args in args_list:
+            try:
+                yield True, fn(*args)
+            except Exception as e:
+                yield False, e
+        return
+
+    pool = get_pool(workers)
+    ids = [next(_task_ids) for _ in args_list]
+    with _task_lock:
+        _waiting.update(ids)
+    pending = [
+        pool.apply_async(_run_task, (tid, fn, args, timeout))
+        for tid, args in zip(ids, args_list)
+    ]
+    try:
+        for tid, res in zip(ids, pending):
+            yield _wait(res, tid, timeout)
+    finally:
+        with _task_lock:
+            _waiting.difference_update(ids)
+            for tid in ids:
+                _started_at.pop(tid, None)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from PIL import Image
+
+from . import registry
+from .imread import read_gray
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Parameters of the text-likelihood prefilter; part of the OCR cache fingerprint
+PREFILTER_PARAMS = {
+    "work_side": 512,  # longest side of the downscaled copy that is scored
+    "min_side": 32,  # images smaller than this (either side) are icons
+    "min_area": 96 * 96,
+    "max_aspect": 15.0,  # rules/borders/strips
+    # Absolute count of line-aligned glyphs that makes an image count as
+    # text, however large it is; a short banner line is enough
+    "min_aligned_chars": 6,
+    # Share of all blobs that must be aligned glyphs (noise and texture
+    # produce many blobs, few of them in text lines)
+    "min_text_share": 0.25,
+}
+
+# Category recorded for images that never reach OCR
+SKIP_CATEGORIES = {
+    "too_small": "Icon",
+    "extreme_aspect": "Decoration",
+    "low_text_score": "Photo",
+}
+
+
+def _char_boxes(binary: np.ndarray) -> tuple[list[tuple[int, int, int, int]], int]:
+    # Character-shaped components as (x, y, w, h), and the total component count
+    cv2 = registry.load("cv2")
+    h = binary.shape[0]
+    n, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    boxes = []
+    for i in range(1, n):
+        x, y, cw, ch, area = stats[i]
+        if not (4 <= ch <= h * 0.25 and cw <= ch * 3 and cw * 10 >= ch):
+            continue
+        if 0.15 <= area / float(cw * ch) <= 0.95:
+            boxes.append((int(x), int(y), int(cw), int(ch)))
+    return boxes, n - 1
+
+
+def _aligned(boxes: list[tuple[int, int, int, int]]) -> int:
+    """Boxes with a similar-height neighbour on the same line close beside them."""
+    boxes = sorted(boxes)
+    paired = set()
+    for k, (x, y, w, h) in enumerate(boxes):
+        cy = y + h / 2.0
+        # Sorted by x, so only boxes starting within reach to the right need checking
+        for j in range(k + 1, len(boxes)):
+            x2, y2, w2, h2 = boxes[j]
+            if x2 > x + w + h * 1.5:
+                break
+            if 0.6 <= h2 / h <= 1.67 and abs(y2 + h2 / 2.0 - cy) <= h / 2.0:
+                paired.update((k, j))
+    return len(paired)
+
+
+def text_score(gray: np.ndarray) -> tuple[float, dict]:
+    """Text likelihood in [0, 1] of a grayscale image, plus the signals used.
+
+    Counts character-shaped connected components (either polarity) that sit
+    in a line with a similar-sized neighbour. The count is absolute, so one
+    headline on a large banner scores as well as a dense page; it is then
+    scaled down by how few of all blobs are such glyphs, which keeps noise
+    and texture out.
+    """
+    cv2 = registry.load("cv2")
+    side = PREFILTER_PARAMS["work_side"]
+    h, w = gray.shape[:2]
+    if max(h, w) > side:
+        scale = side / max(h, w)
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+    binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    aligned, total = 0, 0
+    for img in (binary, 255 - binary):
+        boxes, n = _char_boxes(img)
+        a = _aligned(boxes)
+        if a >= aligned:
+            aligned, total = a, n
+    text_term = min(aligned / PREFILTER_PARAMS["min_aligned_chars"], 1.0)
+    share = aligned / max(total, 1)
+    purity = min(share / PREFILTER_PARAMS["min_text_share"], 1.0)
+    score = text_term * purity
+    stats = {
+        "aligned_chars": aligned,
+        "components": total,
+        "score": round(score, 3),
+    }
+    return score, stats
+
+
+def should_ocr(path: str, min_score: float) -> tuple[bool, str | None, dict]:
+    """Decide whether an image is worth OCR; returns (run_ocr, skip_reason, stats).
+
+    Size and aspect come from the file header; the score is computed on a
+    grayscale decode already reduced to work_side.
+    """
+    with Image.open(path) as img:
+        w, h = img.size
+    if min(h, w) < PREFILTER_PARAMS["min_side"] or h * w < PREFILTER_PARAMS["min_area"]:
+        return False, "too_small", {"size": [w, h]}
+    if max(h, w) / max(min(h, w), 1) > PREFILTER_PARAMS["max_aspect"]:
+        return False, "extreme_aspect", {"size": [w, h]}
+    score, stats = text_score(read_gray(path, PREFILTER_PARAMS["work_side"]))
+    if score < min_score:
+        return False, "low_text_score", stats
+    return True, None, stats
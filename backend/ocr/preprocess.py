@@ -1,9 +1,52 @@
-import cv2
-import numpy as np
+from __future__ import annotations
+
+import hashlib
+import json
 import os
+from typing import TYPE_CHECKING
+
+from . import registry
+from .utils import file_sha256
+
+if TYPE_CHECKING:
+    import numpy as np
 
 PROCESSED_DIRNAME = "processed"
 
+# Images are upscaled so their longest side is at least this (all profiles)
+MIN_SIDE = 1024
+
+# denoise: "none", "median" (3x3) or "nlmeans" (fastNlMeansDenoising, slow on large images)
+PREPROCESS_PROFILES = {
+    "fast": {
+        "upscale": "linear", "denoise": "none", "denoise_h": 0, "morph_kernel": 0, "clahe": False,
+    },
+    "balanced": {
+        "upscale": "cubic", "denoise": "median", "denoise_h": 0, "morph_kernel": 2, "clahe": True,
+    },
+    "heavy": {
+        "upscale": "cubic", "denoise": "nlmeans", "denoise_h": 7, "morph_kernel": 2, "clahe": True,
+    },
+}
+CLAHE_CLIP = 2.0
+CLAHE_TILE = 8
+
+# Thresholds on image_stats() used by choose_profile()
+AUTO_PROFILE_RULES = {
+    "heavy_min_noise": 8.0,
+    "balanced_min_noise": 3.0,
+    "balanced_max_contrast": 80.0,
+}
+
+# Everything that shapes preprocess output; part of the OCR cache fingerprint
+PREPROCESS_PARAMS = {
+    "min_side": MIN_SIDE,
+    "profiles": PREPROCESS_PROFILES,
+    "clahe_clip": CLAHE_CLIP,
+    "clahe_tile": CLAHE_TILE,
+    "auto": AUTO_PROFILE_RULES,
+}
+
 
 def ensure_processed_dir(images_root: str) -> str:
     out_dir = os.path.join(images_root, PROCESSED_DIRNAME)
@@ -11,31 +54,152 @@ def ensure_processed_dir(images_root: str) -> str:
     return out_dir
 
 
-def preprocess_image(path: str) -> np.ndarray:
-    img = cv2.imread(path)
+def processed_size(h: int, w: int) -> tuple[int, int]:
+    # Output (h, w) of preprocess_image for an input of the given size
+    if max(h, w) < MIN_SIDE:
+        scale = MIN_SIDE / max(h, w)
+        return int(h * scale), int(w * scale)
+    return h, w
+
+
+def image_stats(gray: np.ndarray) -> dict:
+    """Cheap statistics of a grayscale image: noise sigma (Immerkaer's
+    Laplacian estimator), contrast (1st-99th percentile spread) and size
+    in megapixels."""
+    cv2 = registry.load("cv2")
+    np = registry.load("numpy")
+    h, w = gray.shape[:2]
+    # Estimate on a bounded copy so the cost does not grow with resolution
+    if max(h, w) > 1024:
+        s = 1024 / max(h, w)
+        size = (max(3, int(w * s)), max(3, int(h * s)))
+        sample = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    else:
+        sample = gray
+    kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+    resp = cv2.filter2D(sample.astype(np.float32), -1, kernel)[1:-1, 1:-1]
+    sh, sw = sample.shape[:2]
+    noise = float(np.abs(resp).sum()) * np.sqrt(np.pi / 2) / (6.0 * max(sh - 2, 1) * max(sw - 2, 1))
+    lo, hi = np.percentile(sample, [1, 99])
+    return {
+        "noise": round(float(noise), 2),
+        "contrast": round(float(hi - lo), 2),
+        "megapixels": round(h * w / 1e6, 2),
+    }
+
+
+def choose_profile(stats: dict) -> str:
+    rules = AUTO_PROFILE_RULES
+    if stats["noise"] >= rules["heavy_min_noise"]:
+        return "heavy"
+    if (stats["noise"] >= rules["balanced_min_noise"]
+            or stats["contrast"] <= rules["balanced_max_contrast"]):
+        return "balanced"
+    return "fast"
+
+
+def preprocess_image(path: str, profile: str = "auto") -> np.ndarray:
+    img = registry.load("cv2").imread(path)
     if img is None:
         raise ValueError(f"Failed to read image: {path}")
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return preprocess_array(img, profile)
+
+
+def preprocess_array(img: np.ndarray, profile: str = "auto") -> np.ndarray:
+    # preprocess_image for an in-memory BGR or grayscale image
+    cv2 = registry.load("cv2")
+    np = registry.load("numpy")
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    if profile == "auto":
+        profile = choose_profile(image_stats(gray))
+    params = PREPROCESS_PROFILES.get(profile)
+    if params is None:
+        raise ValueError(f"Unknown preprocess profile: {profile}")
     # Resize for better OCR if too small
     h, w = gray.shape[:2]
-    if max(h, w) < 1024:
-        scale = 1024 / max(h, w)
-        gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_CUBIC)
+    if max(h, w) < MIN_SIDE:
+        scale = MIN_SIDE / max(h, w)
+        interp = cv2.INTER_CUBIC if params["upscale"] == "cubic" else cv2.INTER_LINEAR
+        gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=interp)
     # Denoise
-    den = cv2.fastNlMeansDenoising(gray, h=7)
+    if params["denoise"] == "nlmeans":
+        gray = cv2.fastNlMeansDenoising(gray, h=params["denoise_h"])
+    elif params["denoise"] == "median":
+        gray = cv2.medianBlur(gray, 3)
     # Threshold
-    thr = cv2.threshold(den, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    res = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
     # Morph open
-    kernel = np.ones((2, 2), np.uint8)
-    morph = cv2.morphologyEx(thr, cv2.MORPH_OPEN, kernel, iterations=1)
+    k = params["morph_kernel"]
+    if k:
+        res = cv2.morphologyEx(res, cv2.MORPH_OPEN, np.ones((k, k), np.uint8), iterations=1)
     # CLAHE
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    res = clahe.apply(morph)
+    if params["clahe"]:
+        clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP, tileGridSize=(CLAHE_TILE, CLAHE_TILE))
+        res = clahe.apply(res)
     return res
 
 
-def save_processed(image: np.ndarray, images_root: str, filename: str) -> str:
+def _params_tag() -> str:
+    blob = json.dumps(PREPROCESS_PARAMS, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()[:8]
+
+
+def _evict(out_dir: str, max_bytes: int, keep: str) -> None:
+    # Least recently used first (hits refresh atime); never the file just
+    # written, nor another worker's temp file. Several pool processes may
+    # evict at once, so files that vanish meanwhile are skipped
+    entries = []
+    for name in os.listdir(out_dir):
+        if ".tmp." in name:
+            continue
+        fp = os.path.join(out_dir, name)
+        try:
+            st = os.stat(fp)
+        except OSError:
+            continue
+        entries.append((st.st_atime, st.st_size, fp))
+    total = sum(size for _, size, _ in entries)
+    for _, size, fp in sorted(entries):
+        if total <= max_bytes:
+            break
+        if fp == keep:
+            continue
+        try:
+            os.remove(fp)
+            total -= size
+        except OSError:
+            pass
+
+
+def preprocess_cached(
+    path: str, images_root: str, profile: str = "auto", max_bytes: int = 0
+) -> np.ndarray:
+    """preprocess_image with an on-disk cache under processed/, keyed by the
+    source file's sha256, the profile and the preprocessing parameters.
+
+    With max_bytes > 0 the cache is kept under that size by evicting the
+    least recently used entries after each write.
+    """
+    cv2 = registry.load("cv2")
     out_dir = ensure_processed_dir(images_root)
-    out_path = os.path.join(out_dir, filename)
-    cv2.imwrite(out_path, image)
-    return out_path
+    key = f"{file_sha256(path)[:24]}_{profile}_{_params_tag()}.png"
+    cached_path = os.path.join(out_dir, key)
+    if os.path.exists(cached_path):
+        img = cv2.imread(cached_path, cv2.IMREAD_GRAYSCALE)
+        if img is not None:
+            try:
+                os.utime(cached_path)
+            except OSError:
+                pass
+            return img
+    img = preprocess_image(path, profile)
+    # Best-effort; write then rename so concurrent workers never read a partial file
+    try:
+        tmp_path = f"{cached_path}.{os.getpid()}.tmp.png"
+        cv2.imwrite(tmp_path, img)
+        os.replace(tmp_path, cached_path)
+        if max_bytes > 0:
+            _evict(out_dir, max_bytes, cached_path)
+    except Exception:
+        pass
+    return img
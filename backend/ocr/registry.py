@@ -0,0 +1,31 @@
+import importlib
+import importlib.util
+import threading
+from types import ModuleType
+
+# Heavy OCR/CV dependencies (numpy, cv2, pytesseract, easyocr, tesserocr) are
+# imported on first use, so app start-up and processes that never OCR
+# (tests, job-only workers) don't load torch/OpenCV
+_loaded: dict[str, ModuleType] = {}
+_lock = threading.Lock()
+
+
+def load(name: str) -> ModuleType:
+    mod = _loaded.get(name)
+    if mod is None:
+        with _lock:
+            mod = _loaded.get(name)
+            if mod is None:
+                mod = importlib.import_module(name)
+                _loaded[name] = mod
+    return mod
+
+
+def available(name: str) -> bool:
+    # Checks installation without importing the module
+    if name in _loaded:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+# Unicode blocks of the scripts our EasyOCR languages are written in
+SCRIPT_RANGES = {
+    "devanagari": [(0x0900, 0x097F), (0xA8E0, 0xA8FF)],
+    "bengali": [(0x0980, 0x09FF)],
+    "gurmukhi": [(0x0A00, 0x0A7F)],
+    "gujarati": [(0x0A80, 0x0AFF)],
+    "tamil": [(0x0B80, 0x0BFF)],
+    "telugu": [(0x0C00, 0x0C7F)],
+    "kannada": [(0x0C80, 0x0CFF)],
+    "arabic": [(0x0600, 0x06FF), (0x0750, 0x077F)],
+    "han": [(0x4E00, 0x9FFF), (0x3400, 0x4DBF)],
+}
+
+# EasyOCR language code -> script; codes not listed are treated as Latin
+LANG_SCRIPTS = {
+    "hi": "devanagari",
+    "mr": "devanagari",
+    "ne": "devanagari",
+    "bn": "bengali",
+    "as": "bengali",
+    "pa": "gurmukhi",
+    "gu": "gujarati",
+    "ta": "tamil",
+    "te": "telugu",
+    "kn": "kannada",
+    "ar": "arabic",
+    "ur": "arabic",
+    "fa": "arabic",
+    "ch_sim": "han",
+    "ch_tra": "han",
+}
+
+MIN_SCRIPT_CHARS = 3
+
+
+def detect_scripts(text: str) -> dict[str, int]:
+    """Character count per script in text (letters only)."""
+    counts: dict[str, int] = {}
+    for ch in text or "":
+        if not ch.isalpha():
+            continue
+        cp = ord(ch)
+        script = "latin" if cp < 0x0250 else None
+        if script is None:
+            for name, ranges in SCRIPT_RANGES.items():
+                if any(lo <= cp <= hi for lo, hi in ranges):
+                    script = name
+                    break
+        if script:
+            counts[script] = counts.get(script, 0) + 1
+    return counts
+
+
+def _scripts(text: str) -> set[str]:
+    return {s for s, n in detect_scripts(text).items() if n >= MIN_SCRIPT_CHARS}
+
+
+def needs_confidence(text: str) -> bool:
+    # choose_langs only looks at the confidence of a Latin-only reading
+    return _scripts(text) == {"latin"}
+
+
+def choose_langs(text: str, conf: float, configured: list[str], min_conf: float) -> list[str]:
+    """Subset of the configured EasyOCR languages an image needs, judged from
+    a first-pass (Tesseract) reading of it.
+
+    Falls back to every configured language when the first pass is too
+    thin or unsure to tell: a low-confidence Latin-only reading may be a
+    non-Latin script Tesseract was not set up for.
+    """
+    scripts = _scripts(text)
+    if not scripts or (scripts == {"latin"} and conf < min_conf):
+        return list(configured)
+    langs = [lang for lang in configured if LANG_SCRIPTS.get(lang, "latin") in scripts]
+    # EasyOCR pairs every script model with English; keep it for digits/labels
+    if "en" in configured and "en" not in langs:
+        langs.insert(0, "en")
+    return langs or list(configured)
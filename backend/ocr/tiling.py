@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import math
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from PIL import Image
+
+from . import registry
+from .engines import checkout_reader, ocr_easyocr_lines, ocr_pytesseract_lines
+from .extract import merge_texts
+from .imread import gray_strips
+from .preprocess import preprocess_array
+from .scripts import choose_langs
+from .utils import get_ocr_langs
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Rough peak working set per tile pixel: tile copy, preprocess buffers and
+# the engines' own copies; used to size tiles and concurrency to the budget
+BYTES_PER_TILE_PIXEL = 16
+MIN_TILE = 512
+
+
+def image_size(path: str) -> tuple[int, int]:
+    # (h, w) from the file header, without decoding pixels
+    with Image.open(path) as img:
+        w, h = img.size
+    return h, w
+
+
+def plan_tiles(
+    h: int, w: int, tile: int, overlap: int
+) -> list[tuple[tuple[int, int, int, int], tuple[int, int, int, int]]]:
+    """Overlapping tiles covering an h x w image.
+
+    Returns [((y0, y1, x0, x1), (cy0, cy1, cx0, cx1))]: the tile and its core.
+    Cores split each overlap down the middle, so they partition the image
+    and every point belongs to exactly one tile's core.
+    """
+    step = max(tile - overlap, 1)
+    half = overlap // 2
+
+    def spans(n: int) -> list[tuple[int, int, int, int]]:
+        starts = list(range(0, max(n - overlap, 1), step))
+        out = []
+        for k, a in enumerate(starts):
+            b = n if k == len(starts) - 1 else min(a + tile, n)
+            core_a = 0 if k == 0 else a + half
+            core_b = n if k == len(starts) - 1 else starts[k + 1] + half
+            out.append((a, b, core_a, core_b))
+        return out
+
+    return [
+        ((y0, y1, x0, x1), (cy0, cy1, cx0, cx1))
+        for y0, y1, cy0, cy1 in spans(h)
+        for x0, x1, cx0, cx1 in spans(w)
+    ]
+
+
+def _ocr_tile(gray: np.ndarray, tile: tuple, core: tuple, opts: dict) -> tuple[list, list, bool]:
+    np = registry.load("numpy")
+    y0, y1, x0, x1 = tile
+    cy0, cy1, cx0, cx1 = core
+    # Copy just this tile out of the memory map
+    img = preprocess_array(np.array(gray[y0:y1, x0:x1]), opts["preprocess_profile"])
+    scale = img.shape[1] / float(x1 - x0)  # small edge tiles may have been upscaled
+
+    def owned(lines):
+        # Keep a line only in the tile whose core holds its center
+        out = []
+        for cx, cy, text, *_ in lines:
+            gx, gy = x0 + cx / scale, y0 + cy / scale
+            if cx0 <= gx < cx1 and cy0 <= gy < cy1 and text.strip():
+                out.append((gy, gx, text.strip()))
+        return out
+
+    tess_lines = ocr_pytesseract_lines(img, opts["tesseract_lang"])
+    confs = [c for *_, c in tess_lines]
+    mean_conf = sum(confs) / len(confs) if confs else 0.0
+    tess_text = "\n".join(t for _, _, t, _ in tess_lines)
+    easy_lines = []
+    run_easyocr = opts["mode"] != "cascade"
+    if not run_easyocr:
+        chars = len("".join(tess_text.split()))
+        run_easyocr = chars < opts["cascade_min_chars"] or mean_conf < opts["cascade_min_conf"]
+    if run_easyocr:
+        langs = None
+        if opts["script_detection"]:
+            langs = choose_langs(tess_text, mean_conf, get_ocr_langs(), opts["cascade_min_conf"])
+        # readtext is not re-entrant: each tile thread OCRs with its own reader
+        with checkout_reader(langs) as reader:
+            easy_lines = ocr_easyocr_lines(img, langs, reader)
+    return owned(tess_lines), owned(easy_lines), run_easyocr
+
+
+def _reading_order(lines: list[tuple[float, float, str]], row_px: float) -> str:
+    lines = sorted(lines, key=lambda line: (int(line[0] // row_px), line[1]))
+    return "\n".join(text for _, _, text in lines)
+
+
+def ocr_tiled(path: str, opts: dict) -> tuple[str, list[str]]:
+    """OCR a very large image tile by tile; returns (merged_text, engines_run).
+
+    The image is decoded to grayscale strip by strip (see imread.gray_strips)
+    into a disk-backed memory map, so no full-size frame is held in memory;
+    tiles are copied out, preprocessed and OCR'd on tile_workers threads,
+    each EasyOCR pass on its own reader (see engines.checkout_reader).
+    Tile size and the number of tiles in flight are capped so their working
+    set stays within tile_memory_mb. Only Tesseract's pytesseract backend
+    reports line boxes, so it is used here regardless of tesseract_backend.
+    """
+    np = registry.load("numpy")
+    budget = int(opts["tile_memory_mb"]) * 1024 * 1024
+    tile = int(opts["tile_size"])
+    max_tile = int(math.sqrt(budget / BYTES_PER_TILE_PIXEL))
+    tile = max(MIN_TILE, min(tile, max_tile))
+    overlap = min(int(opts["tile_overlap"]), tile // 4)
+    per_tile = tile * tile * BYTES_PER_TILE_PIXEL
+    in_flight = max(1, min(int(opts["tile_workers"]), budget // per_tile))
+
+    with tempfile.TemporaryDirectory(prefix="ocr_tiles_") as tmp:
+        # Tiles are not running yet, so decoding may use half the budget
+        (h, w), strips = gray_strips(path, budget // 2)
+        gray = np.lib.format.open_memmap(
+            os.path.join(tmp, "gray.npy"), mode="w+", dtype=np.uint8, shape=(h, w)
+        )
+        for y, strip in strips:
+            gray[y:y + strip.shape[0]] = strip
+        gray.flush()
+
+        plan = plan_tiles(h, w, tile, overlap)
+        tess_all, easy_all = [], []
+        easyocr_ran = False
+        with ThreadPoolExecutor(max_workers=in_flight) as ex:
+            futures = [ex.submit(_ocr_tile, gray, t, core, opts) for t, core in plan]
+            for future in futures:
+                tess, easy, ran = future.result()
+                tess_all.extend(tess)
+                easy_all.extend(easy)
+                easyocr_ran = easyocr_ran or ran
+        del gray  # release the map before the directory is removed
+
+    row_px = max(8.0, tile / 64.0)
+    t1 = _reading_order(tess_all, row_px)
+    t2 = _reading_order(easy_all, row_px)
+    engines = ["pytesseract", "easyocr"] if easyocr_ran else ["pytesseract"]
+    return merge_texts(t1, t2), engines
@@ -1,5 +1,7 @@
 import re
 import os
+import json
+import hashlib
 from functools import lru_cache
 
 
@@ -23,3 +25,37 @@ def safe_join(base: str, *paths: str) -> str:
 def get_ocr_langs() -> list[str]:
     langs = os.getenv("OCR_LANGS", "en,hi")
     return [s.strip() for s in langs.split(",") if s.strip()]
+
+
+@lru_cache(maxsize=1)
+def get_max_readers() -> int:
+    # EasyOCR readers (one per language set) kept loaded per process
+    return max(1, int(os.getenv("OCR_MAX_READERS", "2")))
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# Pipeline options that only change how fast OCR runs (threads per tiled
+# image, images per batched EasyOCR call, preprocessing cache size), never
+# its output
+THROUGHPUT_OPTIONS = ("tile_workers", "easyocr_batch_size", "preprocess_cache_mb")
+
+
+def ocr_config_fingerprint(
+    engines: list[str], preprocess_params: dict, options: dict | None = None
+) -> str:
+    # Any change to engines, languages, preprocessing or pipeline options
+    # (other than THROUGHPUT_OPTIONS) invalidates cached OCR
+    cfg = {
+        "engines": list(engines),
+        "langs": get_ocr_langs(),
+        "preprocess": preprocess_params,
+        "options": {k: v for k, v in (options or {}).items() if k not in THROUGHPUT_OPTIONS},
+    }
+    return hashlib.sha256(json.dumps(cfg, sort_keys=True).encode("utf-8")).hexdigest()
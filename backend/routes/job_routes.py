@@ -0,0 +1,53 @@
+from flask import Blueprint, request, jsonify
+
+from db import db
+from models.job import Job
+from services.job_service import submit_job, get_progress
+from services.ocr_service import create_batch, parse_image_ids
+
+job_bp = Blueprint('job_bp', __name__)
+
+
+def _accepted(job: Job):
+    return jsonify({'status': 'accepted', 'job_id': job.id, 'status_url': f'/jobs/{job.id}'}), 202
+
+
+@job_bp.route('/jobs/extract-ocr-data', methods=['POST'])
+def queue_ocr():
+    body = request.get_json(silent=True) or {}
+    filename = (body.get('filename') or request.args.get('filename', '')).strip()
+    image_ids = parse_image_ids(body.get('image_ids') or request.args.get('image_ids', ''))
+    force = str(body.get('force', request.args.get('force', 'false'))).lower() == 'true'
+    # The batch is recorded up front so a recovered job resumes it rather than starting over
+    data, status = create_batch(filename, image_ids, force)
+    if status >= 400:
+        return jsonify(data), status
+    return _accepted(submit_job('ocr', {'batch_id': data['batch_id']}))
+
+
+@job_bp.route('/jobs/extract-images', methods=['POST'])
+def queue_images():
+    filename = request.args.get('filename', '').strip()
+    if not filename:
+        return jsonify({'status': 'error', 'message': 'filename query param required'}), 400
+    reextract = (request.args.get('reextract', 'false').lower() == 'true')
+    return _accepted(submit_job('extract-images', {'filename': filename, 'reextract': reextract}))
+
+
+@job_bp.route('/jobs/extract-text', methods=['POST'])
+def queue_text():
+    filename = request.args.get('filename', '').strip()
+    if not filename:
+        return jsonify({'status': 'error', 'message': 'filename query param required'}), 400
+    reextract = (request.args.get('reextract', 'false').lower() == 'true')
+    return _accepted(submit_job('extract-text', {'filename': filename, 'reextract': reextract}))
+
+
+@job_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id: str):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    data = job.to_dict()
+    data['progress'] = get_progress(job)
+    return jsonify({'status': 'success', 'job': data}), 200
@@ -1,81 +1,27 @@
-import os
-import json
-import time
-from flask import Blueprint, jsonify, current_app
-from werkzeug.utils import secure_filename
+from flask import Blueprint, request, jsonify
 
-from db import db
-from models.ocr_extracted import OCRExtracted
-from ocr.preprocess import preprocess_image, save_processed, ensure_processed_dir
-from ocr.engines import ocr_pytesseract, ocr_easyocr
-from ocr.extract import merge_texts, build_structured
+from services.ocr_service import run_ocr, resume_batch, get_batch, parse_image_ids
 
 ocr_bp = Blueprint('ocr_bp', __name__)
 
-IMAGES_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static', 'images'))
-
-
-def _list_images(root: str) -> list[str]:
-    if not os.path.isdir(root):
-        return []
-    exts = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff'}
-    return [f for f in os.listdir(root) if os.path.splitext(f.lower())[1] in exts]
-
 
 @ocr_bp.route('/extract-ocr-data', methods=['POST'])
 def extract_ocr_data():
-    start = time.time()
-    try:
-        current_app.logger.info('ocr_extraction started', extra={'context': {}})
-    except Exception:
-        pass
-    os.makedirs(IMAGES_ROOT, exist_ok=True)
-    ensure_processed_dir(IMAGES_ROOT)
+    body = request.get_json(silent=True) or {}
+    filename = (body.get('filename') or request.args.get('filename', '')).strip()
+    image_ids = parse_image_ids(body.get('image_ids') or request.args.get('image_ids', ''))
+    force = str(body.get('force', request.args.get('force', 'false'))).lower() == 'true'
+    data, status = run_ocr(filename, image_ids, force=force)
+    return jsonify(data), status
 
-    files = _list_images(IMAGES_ROOT)
-    if not files:
-        return jsonify({'status': 'error', 'message': 'No images found in static/images/'}), 400
 
-    results = []
-    for name in files:
-        safe_name = secure_filename(name)
-        try:
-            in_path = os.path.join(IMAGES_ROOT, safe_name)
-            img = preprocess_image(in_path)
-            # Save processed image (best-effort)
-            try:
-                save_processed(img, IMAGES_ROOT, safe_name)
-            except Exception:
-                pass
-            # OCR
-            t1 = ocr_pytesseract(img)
-            t2 = ocr_easyocr(img)
-            merged = merge_texts(t1, t2)
-            payload = build_structured(safe_name, merged)
+@ocr_bp.route('/extract-ocr-data/batches/<batch_id>', methods=['GET'])
+def ocr_batch_status(batch_id: str):
+    data, status = get_batch(batch_id)
+    return jsonify(data), status
 
-            # Store
-            rec = OCRExtracted(
-                image_name=safe_name,
-                category=payload.get('category'),
-                extracted_text=payload.get('raw_text'),
-                structured_json=json.dumps(payload.get('details', {}), ensure_ascii=False),
-            )
-            db.session.add(rec)
-            db.session.commit()
 
-            results.append(payload)
-        except Exception as e:
-            results.append({
-                'image': safe_name,
-                'error': 'Text not detected'
-            })
-            try:
-                current_app.logger.error('ocr_extraction failed', extra={'context': {'image': safe_name}})
-            except Exception:
-                pass
-    duration_ms = round((time.time() - start) * 1000)
-    try:
-        current_app.logger.info('ocr_extraction completed', extra={'context': {'count': len(results), 'duration_ms': duration_ms}})
-    except Exception:
-        pass
-    return jsonify({'status': 'success', 'message': 'OCR complete', 'data': results}), 200
+@ocr_bp.route('/extract-ocr-data/batches/<batch_id>/resume', methods=['POST'])
+def resume_ocr_batch(batch_id: str):
+    data, status = resume_batch(batch_id)
+    return jsonify(data), status
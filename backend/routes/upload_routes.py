@@ -9,30 +9,24 @@ def test():
 # --- Spec 2: PDF Upload ---
 import os
 from flask import request, jsonify, current_app
-from werkzeug.utils import secure_filename
-from db import db
-from models.pdf_model import PDFUpload
+from config import Config
+from services.job_service import queue_extraction
+from services.upload_service import (
+    save_upload,
+    create_session,
+    get_session,
+    append_chunk,
+    finalize_session,
+    abort_session,
+    save_uploads,
+    record_batch,
+    get_upload_batch,
+    too_large,
+)
 
 ALLOWED_EXT = {'.pdf'}
-MAX_MB = 20
-
-def _is_pdf_content(file_stream: bytes) -> bool:
-    try:
-        head = file_stream.read(4)
-        file_stream.seek(0)
-        # PDF files begin with %PDF
-        return head == b'%PDF'
-    except Exception:
-        return False
-
-def _unique_rename(dest_dir: str, filename: str) -> str:
-    name, ext = os.path.splitext(filename)
-    i = 1
-    candidate = filename
-    while os.path.exists(os.path.join(dest_dir, candidate)):
-        candidate = f"{name}({i}){ext}"
-        i += 1
-    return candidate
+# extract= values accepted by /upload/batch -> job kinds
+EXTRACT_KINDS = {'text': 'extract-text', 'images': 'extract-images'}
 
 @upload_bp.route('/upload', methods=['POST'])
 def upload_file():
@@ -48,43 +42,105 @@ def upload_file():
     if ext not in ALLOWED_EXT:
         return jsonify({'error': 'Only PDF files are allowed'}), 400
 
-    # Content-type and magic header check for extra safety
-    if file.mimetype not in ('application/pdf', 'application/x-pdf') or not _is_pdf_content(file.stream):
+    if file.mimetype not in ('application/pdf', 'application/x-pdf'):
         return jsonify({'error': 'Invalid PDF content'}), 400
 
-    # Size limit (in case MAX_CONTENT_LENGTH not triggered)
-    file.stream.seek(0, os.SEEK_END)
-    size_bytes = file.stream.tell()
-    file.stream.seek(0)
-    if size_bytes > MAX_MB * 1024 * 1024:
-        return jsonify({'error': 'File too large (max 20MB)'}), 400
+    # Header check, size limit and hashing happen while the file is written;
+    # identical bytes return the existing record
+    data, status = save_upload(file.stream, file.filename)
+    return jsonify(data), status
 
-    uploads_dir = current_app.config['UPLOAD_FOLDER']
-    os.makedirs(uploads_dir, exist_ok=True)
 
-    filename = secure_filename(file.filename)
-    filename = _unique_rename(uploads_dir, filename)
-    file_path = os.path.join(uploads_dir, filename)
+@upload_bp.route('/upload/stream', methods=['POST'])
+def upload_stream():
+    # Raw PDF body (no multipart), read straight from the request in chunks
+    filename = (request.args.get('filename') or request.headers.get('X-Filename', '')).strip()
+    if not filename:
+        return jsonify({'error': 'filename query param required'}), 400
+    if os.path.splitext(filename)[1].lower() not in ALLOWED_EXT:
+        return jsonify({'error': 'Only PDF files are allowed'}), 400
+    current_app.logger.info('upload attempt', extra={"context": {"route": "/upload/stream"}})
+    # Refuse a declared oversize body before reading any of it
+    if request.content_length and request.content_length > current_app.config['MAX_CONTENT_LENGTH']:
+        data, status = too_large()
+        return jsonify(data), status
+    data, status = save_upload(request.stream, filename)
+    return jsonify(data), status
+
+
+@upload_bp.route('/upload/batch', methods=['POST'])
+def upload_batch():
+    # Many PDFs (and/or .zip archives of PDFs) as multipart "files" parts;
+    # ?extract=text,images (or true) queues extraction jobs per stored file
+    current_app.logger.info('upload attempt', extra={"context": {"route": "/upload/batch"}})
+    # Raise the body limit for this view only; each file is still capped at UPLOAD_MAX_MB
+    request.max_content_length = Config.UPLOAD_BATCH_MAX_MB * 1024 * 1024
+    extract = (request.args.get('extract') or request.form.get('extract') or '').lower()
+    if extract in ('true', 'all'):
+        extract = ','.join(EXTRACT_KINDS)
+    names = [k.strip() for k in extract.split(',') if k.strip() and k.strip() != 'false']
+    if any(k not in EXTRACT_KINDS for k in names):
+        return jsonify({'error': f"extract must be one of: {', '.join(EXTRACT_KINDS)}"}), 400
+    files = request.files.getlist('files') + request.files.getlist('file')
+    if not files:
+        return jsonify({'error': 'No file provided'}), 400
 
+    data, status = save_uploads(files)
+    if status == 200 and names:
+        stored = [f['filename'] for f in data['files'] if 'filename' in f]
+        jobs = queue_extraction(stored, [EXTRACT_KINDS[k] for k in names])
+        for f in data['files']:
+            if 'filename' in f:
+                f['jobs'] = jobs[f['filename']]
+    if status == 200:
+        data['batch_id'] = record_batch(data['files'])
+        data['status_url'] = f"/upload/batch/{data['batch_id']}"
+    return jsonify(data), status
+
+
+@upload_bp.route('/upload/batch/<batch_id>', methods=['GET'])
+def upload_batch_status(batch_id: str):
+    # Per-file upload result plus the live status of its extraction jobs
+    data, status = get_upload_batch(batch_id)
+    return jsonify(data), status
+
+
+# --- Resumable uploads: create, PATCH chunks at Upload-Offset, finalize ---
+@upload_bp.route('/uploads', methods=['POST'])
+def create_upload():
+    body = request.get_json(silent=True) or {}
+    size = body.get('size')
     try:
-        file.save(file_path)
-    except Exception:
-        current_app.logger.error('file save failed', extra={"context": {"path": file_path}})
-        return jsonify({'error': 'Upload failed. Please try again.'}), 500
-
-    size_mb = round(os.path.getsize(file_path) / (1024 * 1024), 2)
-    rel_path = f"/static/uploads/{filename}"
-
-    # Persist metadata
-    new_file = PDFUpload(filename=filename, size=size_mb, path=rel_path)
-    db.session.add(new_file)
-    db.session.commit()
-
-    current_app.logger.info('upload success', extra={"context": {"file": filename, "size_mb": size_mb}})
-    return jsonify({
-        'status': 'success',
-        'filename': filename,
-        'path': rel_path,
-        'size': size_mb,
-        'uploaded_at': str(new_file.upload_date)
-    }), 200
+        size = int(size) if size is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size must be an integer'}), 400
+    data, status = create_session(body.get('filename', ''), size)
+    return jsonify(data), status
+
+
+@upload_bp.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id: str):
+    data, status = get_session(upload_id)
+    return jsonify(data), status
+
+
+@upload_bp.route('/uploads/<upload_id>', methods=['PATCH'])
+def upload_chunk(upload_id: str):
+    try:
+        offset = int(request.headers.get('Upload-Offset', request.args.get('offset', '')))
+    except ValueError:
+        return jsonify({'error': 'Upload-Offset header required'}), 400
+    data, status = append_chunk(upload_id, request.stream, offset)
+    return jsonify(data), status
+
+
+@upload_bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id: str):
+    data, status = finalize_session(upload_id)
+    return jsonify(data), status
+
+
+@upload_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+def delete_upload(upload_id: str):
+    data, status = abort_session(upload_id)
+    return jsonify(data), status
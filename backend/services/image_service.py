@@ -0,0 +1,276 @@
+import os
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+from PIL import Image
+from sqlalchemy import insert
+
+from config import Config
+from db import db
+from models.extracted_image import ExtractedImage
+from services.upload_service import content_source
+from extraction.engines import page_ranges
+from ocr.phash import dhash
+
+try:
+    import fitz  # PyMuPDF
+    HAS_PYMUPDF = True
+except Exception:
+    HAS_PYMUPDF = False
+
+
+def _resolve_pdf_path(filename: str) -> str:
+    candidates = [
+        os.path.join(Config.UPLOAD_FOLDER, filename),
+        os.path.join(Config.UPLOAD_FOLDER, 'temp', filename),
+    ]
+    for p in candidates:
+        ap = os.path.abspath(p)
+        if ap.startswith(os.path.dirname(Config.UPLOAD_FOLDER)) and os.path.exists(ap):
+            return ap
+    return ''
+
+
+def _save_png(img: Image.Image, base_dir: str, out_name: str) -> str:
+    os.makedirs(base_dir, exist_ok=True)
+    out_path = os.path.join(base_dir, out_name)
+    img.save(out_path, format='PNG')
+    # compress if > 2MB by reducing size ~25%
+    try:
+        if os.path.getsize(out_path) > 2 * 1024 * 1024:
+            w, h = img.size
+            resized = img.resize((int(w * 0.75), int(h * 0.75)), Image.LANCZOS)
+            resized.save(out_path, format='PNG')
+    except Exception:
+        pass
+    return out_path
+
+
+# Formats browsers display as-is; anything else (jpx, jb2, tiff, pnm, ...) is transcoded to PNG
+WEB_IMAGE_EXTS = {'png', 'jpeg', 'jpg', 'gif', 'webp'}
+
+
+def save_extracted_image(
+    base_image: dict, base_dir: str, stem: str, passthrough: bool = True
+) -> Tuple[str, int, int]:
+    """Write a fitz extract_image() result as <stem>.<ext>; returns (out_name, width, height).
+
+    With passthrough, web-displayable formats are written byte-for-byte
+    without decoding; other formats go through PIL to PNG.
+    """
+    ext = (base_image.get('ext') or '').lower()
+    if passthrough and ext in WEB_IMAGE_EXTS:
+        out_name = f"{stem}.{ext}"
+        os.makedirs(base_dir, exist_ok=True)
+        with open(os.path.join(base_dir, out_name), 'wb') as f:
+            f.write(base_image['image'])
+        return out_name, base_image['width'], base_image['height']
+    pil_img = Image.open(io.BytesIO(base_image['image'])).convert('RGBA')
+    out_name = f"{stem}.png"
+    _save_png(pil_img, base_dir, out_name)
+    w, h = pil_img.size
+    return out_name, w, h
+
+
+def _write_xref(doc, xref: int, stem: str, images_dir: str, passthrough: bool) -> Optional[tuple]:
+    # (out_name, w, h, phash), or None when the image could not be written
+    try:
+        base_image = doc.extract_image(xref)
+        out_name, w, h = save_extracted_image(base_image, images_dir, stem, passthrough)
+    except Exception:
+        return None
+    try:
+        phash = dhash(os.path.join(images_dir, out_name))
+    except Exception:
+        phash = None
+    return out_name, w, h, phash
+
+
+def _write_xrefs(pdf_path: str, items: list, images_dir: str, passthrough: bool) -> list:
+    # Runs in a worker process; each call opens its own document.
+    # Returns [(xref, (out_name, w, h, phash) or None)] in input order.
+    with fitz.open(pdf_path) as doc:
+        return [
+            (xref, _write_xref(doc, xref, stem, images_dir, passthrough)) for xref, stem in items
+        ]
+
+
+def _write_images(
+    pdf_path: str, first_seen: dict, page_count: int, images_dir: str, workers: int
+) -> Iterator[tuple[int, list]]:
+    """Write each unique xref; yields (pages_done, [(xref, written or None)]).
+
+    Serially the document is opened once and progress moves page by page;
+    otherwise page ranges that have images go to `workers` processes.
+    """
+    passthrough = Config.IMAGE_PASSTHROUGH
+    if workers <= 1:
+        with fitz.open(pdf_path) as doc:
+            by_page = groupby(first_seen.items(), key=lambda entry: entry[1][0])
+            for page_number, entries in by_page:
+                yield page_number, [
+                    (xref, _write_xref(doc, xref, stem, images_dir, passthrough))
+                    for xref, (_, stem) in entries
+                ]
+    else:
+        chunks = [
+            (b, [(xref, stem) for xref, (page_number, stem) in first_seen.items()
+                 if a < page_number <= b])
+            for a, b in page_ranges(page_count, workers * 4)
+        ]
+        chunks = [(end_page, items) for end_page, items in chunks if items]
+        n = len(chunks)
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            written = ex.map(
+                _write_xrefs, [pdf_path] * n, [items for _, items in chunks],
+                [images_dir] * n, [passthrough] * n,
+            )
+            for (end_page, _), out in zip(chunks, written):
+                yield end_page, out
+    yield page_count, []
+
+
+def _image_entry(rec: ExtractedImage) -> dict:
+    return {
+        'id': rec.id,
+        'filename': rec.filename,
+        'page_number': rec.page_number,
+        'dimensions': f"{rec.width}x{rec.height}",
+        'url': rec.file_path,
+        'thumbnail_url': f"/images/{rec.id}/rendition?w=320",
+    }
+
+
+def extract_pdf_images(
+    filename: str,
+    reextract: bool = False,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+) -> Tuple[dict, int]:
+    """Extract embedded images of an uploaded PDF into static/images.
+
+    Each distinct image object (xref) is decoded and written once; repeat
+    placements on other pages get their own rows pointing at that file.
+    Large documents spread the writes over IMAGE_WORKERS processes by page
+    range; rows are inserted in one batch, in page/image order.
+    Returns (response_body, http_status); progress(stage, done, total) is
+    called as pages (page ranges, when parallel) complete.
+    """
+    start = time.time()
+    if not HAS_PYMUPDF:
+        return {'status': 'error', 'message': 'PyMuPDF not available'}, 500
+
+    filename = secure_filename(filename or '')
+    if not filename:
+        return {'status': 'error', 'message': 'filename query param required'}, 400
+    # Duplicate uploads share the images of the first upload with the same bytes
+    filename = content_source(filename)
+
+    # if already extracted and not forcing, return existing
+    if not reextract:
+        existing: List[ExtractedImage] = (
+            ExtractedImage.query.filter_by(pdf_filename=filename)
+            .order_by(ExtractedImage.id.asc())
+            .all()
+        )
+        if existing:
+            images = [_image_entry(rec) for rec in existing]
+            unique = len({rec.file_path for rec in existing})
+            duration = round((time.time() - start) * 1000)
+            current_app.logger.info('image extract cached', extra={"context": {
+                "file": filename, "total": len(images), "duration_ms": duration,
+            }})
+            return {
+                'status': 'success',
+                'total_images': len(images),
+                'unique_images': unique,
+                'images': images,
+            }, 200
+
+    pdf_path = _resolve_pdf_path(filename)
+    if not pdf_path:
+        return {'status': 'error', 'message': 'File not found'}, 400
+
+    images_dir = os.path.abspath(os.path.join(os.path.dirname(Config.UPLOAD_FOLDER), 'images'))
+
+    # If reextract, delete existing DB rows for this filename
+    if reextract:
+        try:
+            ExtractedImage.query.filter_by(pdf_filename=filename).delete()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+    try:
+        with fitz.open(pdf_path) as doc:
+            page_count = len(doc)
+            base_name, _ = os.path.splitext(os.path.basename(filename))
+            placements = []  # (page_number, xref) in page/image order
+            first_seen = {}  # xref -> (page_number, output stem) of its first placement
+            for page_index in range(page_count):
+                page_images = doc.load_page(page_index).get_images(full=True)
+                for img_index, img in enumerate(page_images, start=1):
+                    xref = img[0]
+                    placements.append((page_index + 1, xref))
+                    if xref not in first_seen:
+                        stem = f"{base_name}_page{page_index+1}_img{img_index}"
+                        first_seen[xref] = (page_index + 1, stem)
+
+        # Decode/write each unique xref once, in the order of its first page
+        workers = Config.IMAGE_WORKERS if len(first_seen) >= Config.IMAGE_PARALLEL_MIN_IMAGES else 0
+        saved = {}  # xref -> (out_name, w, h, phash); missing when the image failed
+        written = _write_images(pdf_path, first_seen, page_count, images_dir, workers)
+        for end_page, out in written:
+            saved.update((xref, entry) for xref, entry in out if entry)
+            if progress:
+                progress('pages', end_page, page_count)
+
+        rows = [
+            {
+                'filename': saved[xref][0],
+                'pdf_filename': filename,
+                'page_number': page_number,
+                'xref': xref,
+                'width': saved[xref][1],
+                'height': saved[xref][2],
+                'phash': saved[xref][3],
+                'file_path': f"/static/images/{saved[xref][0]}",
+            }
+            for page_number, xref in placements if xref in saved
+        ]
+        ids = []
+        if rows:
+            # One INSERT ... RETURNING for all rows; ids come back in row order
+            ids = db.session.execute(
+                insert(ExtractedImage).returning(ExtractedImage.id, sort_by_parameter_order=True),
+                rows,
+            ).scalars().all()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.error('image extract failed', extra={"context": {"file": filename}})
+        return {'status': 'error', 'message': 'Failed to extract images from PDF'}, 500
+
+    results = [_image_entry(ExtractedImage(id=image_id, **row)) for image_id, row in zip(ids, rows)]
+    extracted_count = len(results)
+    if extracted_count == 0:
+        return {'status': 'error', 'message': 'No images found in PDF.'}, 200
+
+    duration = round((time.time() - start) * 1000)
+    current_app.logger.info('image extract success', extra={"context": {
+        "file": filename,
+        "total": extracted_count,
+        "unique": len(saved),
+        "workers": workers,
+        "duration_ms": duration,
+    }})
+    return {
+        'status': 'success',
+        'total_images': extracted_count,
+        'unique_images': len(saved),
+        'images': results,
+    }, 200
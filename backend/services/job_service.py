@@ -0,0 +1,291 @@
+import json
+import os
+import socket
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Tuple
+
+from flask import Flask, current_app
+from sqlalchemy import or_, update
+
+from config import Config
+from db import db
+from models.job import Job
+from services.ocr_service import run_ocr, run_batch
+from services.image_service import extract_pdf_images
+from services.text_service import extract_pdf_text
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def _run_ocr_job(params: dict, progress) -> Tuple[dict, int]:
+    # Jobs run off the request thread, so they can wait out retry backoff
+    if params.get('batch_id'):
+        return run_batch(params['batch_id'], progress=progress, wait_for_retries=True)
+    return run_ocr(
+        params.get('filename', ''),
+        params.get('image_ids') or [],
+        force=bool(params.get('force')),
+        progress=progress,
+        wait_for_retries=True,
+    )
+
+
+def _run_images_job(params: dict, progress) -> Tuple[dict, int]:
+    return extract_pdf_images(
+        params.get('filename', ''), reextract=bool(params.get('reextract')), progress=progress
+    )
+
+
+def _run_text_job(params: dict, progress) -> Tuple[dict, int]:
+    return extract_pdf_text(
+        params.get('filename', ''), reextract=bool(params.get('reextract')), progress=progress
+    )
+
+
+JOB_RUNNERS: Dict[str, Callable[[dict, Callable], Tuple[dict, int]]] = {
+    'ocr': _run_ocr_job,
+    'extract-images': _run_images_job,
+    'extract-text': _run_text_job,
+}
+
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+_recovered = False
+# Live per-stage progress of jobs running in this process. It is also
+# written to the jobs table, throttled to one write per job every
+# PROGRESS_WRITE_SECONDS (plus the end of each stage), on a connection of its
+# own so it never commits the service's pending rows
+_live_progress: Dict[str, dict] = {}
+_progress_written: Dict[str, float] = {}  # job id -> time of the last write
+PROGRESS_WRITE_SECONDS = 2.0
+# SQLite lock wait for a progress write; a skipped write is caught up later
+PROGRESS_BUSY_TIMEOUT_MS = 200
+# Each process touches the heartbeat of the jobs it owns this often. A
+# queued/running job whose heartbeat is older than JOB_STALE_SECONDS lost
+# its process and is claimed by whichever process recovers it first
+JOB_HEARTBEAT_SECONDS = 10.0
+JOB_STALE_SECONDS = 60.0
+_heartbeat_started = False
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, Config.JOB_WORKERS), thread_name_prefix='job'
+            )
+        return _executor
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _write_best_effort(stmt) -> bool:
+    # On a connection of its own, so it never commits the service's pending
+    # rows; another writer holding the database only delays the update
+    try:
+        with db.engine.connect() as conn:
+            sqlite = conn.dialect.name == 'sqlite'
+            if sqlite:
+                busy = conn.exec_driver_sql('PRAGMA busy_timeout').scalar()
+                conn.exec_driver_sql(f'PRAGMA busy_timeout = {PROGRESS_BUSY_TIMEOUT_MS}')
+            try:
+                conn.execute(stmt)
+                conn.commit()
+            finally:
+                if sqlite:
+                    conn.rollback()
+                    conn.exec_driver_sql(f'PRAGMA busy_timeout = {int(busy)}')
+        return True
+    except Exception:
+        return False
+
+
+def _write_progress(job_id: str, snapshot: dict):
+    stmt = update(Job).where(Job.id == job_id).values(progress_json=json.dumps(snapshot))
+    if not _write_best_effort(stmt):
+        with _lock:
+            _progress_written.pop(job_id, None)
+
+
+def _heartbeat(app: Flask):
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        with app.app_context():
+            _write_best_effort(
+                update(Job)
+                .where(Job.owner == _owner(), Job.status.in_(ACTIVE_STATUSES))
+                .values(heartbeat_at=datetime.utcnow())
+            )
+            # Also picks up jobs of processes that died after this one started
+            _recover_stale(app)
+
+
+def _ensure_heartbeat(app: Flask):
+    global _heartbeat_started
+    with _lock:
+        if _heartbeat_started:
+            return
+        _heartbeat_started = True
+    threading.Thread(target=_heartbeat, args=(app,), name='job-heartbeat', daemon=True).start()
+
+
+def _progress_callback(job_id: str) -> Callable[[str, int, int], None]:
+    def report(stage: str, done: int, total: int):
+        now = time.monotonic()
+        with _lock:
+            live = _live_progress.setdefault(job_id, {})
+            live[stage] = {'done': done, 'total': total}
+            last = _progress_written.get(job_id, 0.0)
+            if done < total and now - last < PROGRESS_WRITE_SECONDS:
+                return
+            _progress_written[job_id] = now
+            snapshot = {k: dict(v) for k, v in live.items()}
+        _write_progress(job_id, snapshot)
+    return report
+
+
+def get_progress(job: Job) -> dict:
+    # Fresher than the throttled row when the job runs in this process
+    with _lock:
+        live = _live_progress.get(job.id)
+        if live is not None:
+            return dict(live)
+    return json.loads(job.progress_json or '{}')
+
+
+def submit_job(kind: str, params: dict) -> Job:
+    if kind not in JOB_RUNNERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = Job(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        status='queued',
+        params_json=json.dumps(params, ensure_ascii=False),
+        owner=_owner(),
+        heartbeat_at=datetime.utcnow(),
+    )
+    db.session.add(job)
+    db.session.commit()
+    app = current_app._get_current_object()
+    _ensure_heartbeat(app)
+    _get_executor().submit(_run_job, app, job.id)
+    try:
+        current_app.logger.info('job queued', extra={'context': {'job_id': job.id, 'kind': kind}})
+    except Exception:
+        pass
+    return job
+
+
+def queue_extraction(filenames: list[str], kinds: list[str]) -> Dict[str, Dict[str, str]]:
+    # One job per (file, kind); they share the JOB_WORKERS pool, so a large
+    # batch drains at a bounded rate. Returns {filename: {kind: job_id}}
+    jobs: Dict[str, Dict[str, str]] = {}
+    for filename in dict.fromkeys(filenames):
+        jobs[filename] = {kind: submit_job(kind, {'filename': filename}).id for kind in kinds}
+    return jobs
+
+
+def _claim_stale(job_id: str) -> bool:
+    # Conditional UPDATE: of all processes recovering at once, exactly one
+    # takes over a job whose owner stopped heartbeating
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=JOB_STALE_SECONDS)
+    result = db.session.execute(
+        update(Job)
+        .where(
+            Job.id == job_id,
+            Job.status.in_(ACTIVE_STATUSES),
+            or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < stale),
+        )
+        .values(status='queued', owner=_owner(), heartbeat_at=now)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _recover_stale(app: Flask):
+    # Re-queue jobs whose process died; the underlying extraction steps
+    # reuse cached results and OCR batches resume where they stopped, so
+    # re-running is safe. Jobs of live processes keep a fresh heartbeat.
+    try:
+        stale = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+        candidates = [
+            j.id for j in Job.query.filter(
+                Job.status.in_(ACTIVE_STATUSES),
+                or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < stale),
+            ).all()
+        ]
+        ids = [job_id for job_id in candidates if _claim_stale(job_id)]
+        for job_id in ids:
+            _get_executor().submit(_run_job, app, job_id)
+        if ids:
+            app.logger.info('jobs recovered', extra={'context': {'count': len(ids)}})
+    except Exception:
+        db.session.rollback()
+
+
+def recover_jobs(app: Flask):
+    global _recovered
+    with _lock:
+        if _recovered:
+            return
+        _recovered = True
+    _ensure_heartbeat(app)
+    _recover_stale(app)
+
+
+def _start(job_id: str) -> bool:
+    # Only the owning process moves its queued job to running
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == 'queued', Job.owner == _owner())
+        .values(status='running', started_at=now, heartbeat_at=now)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _run_job(app: Flask, job_id: str):
+    with app.app_context():
+        if not _start(job_id):
+            return
+        job = db.session.get(Job, job_id)
+        kind = job.kind
+        params = json.loads(job.params_json or '{}')
+
+        progress = _progress_callback(job_id)
+        result, result_status, error = None, None, None
+        try:
+            result, result_status = JOB_RUNNERS[kind](params, progress)
+            if result_status >= 400:
+                error = result.get('message')
+        except Exception as e:
+            db.session.rollback()
+            error = str(e) or e.__class__.__name__
+            app.logger.error('job failed', extra={'context': {
+                'job_id': job_id, 'kind': kind, 'error': error,
+            }})
+
+        job = db.session.get(Job, job_id)
+        job.status = 'failed' if error else 'succeeded'
+        job.error = error
+        job.result_json = json.dumps(result, ensure_ascii=False) if result is not None else None
+        job.result_status = result_status
+        with _lock:
+            _progress_written.pop(job_id, None)
+            live = _live_progress.pop(job_id, None)
+        if live is not None:
+            job.progress_json = json.dumps(live)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        app.logger.info('job finished', extra={'context': {
+            'job_id': job_id, 'kind': kind, 'status': job.status,
+        }})
@@ -0,0 +1,592 @@
+import os
+import json
+import time
+import uuid
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import insert
+from werkzeug.utils import secure_filename
+
+from config import Config
+from db import db
+from models.ocr_extracted import OCRExtracted
+from models.extracted_image import ExtractedImage
+from models.ocr_batch import OCRBatch, OCRBatchItem
+from ocr.preprocess import ensure_processed_dir, processed_size, PREPROCESS_PARAMS
+from ocr.prefilter import PREFILTER_PARAMS
+from ocr.engines import DEFAULT_ENGINES
+from ocr.pipeline import process_group, group_by_size, TRANSIENT_ERRORS
+from ocr.pool import iter_ordered, LOST_TASK_ERRORS
+from ocr.utils import file_sha256, ocr_config_fingerprint
+from ocr.phash import BKTree, confirm_near, dhash
+from services.upload_service import content_source
+
+IMAGES_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static', 'images'))
+
+# config_hash -> (BK-tree of OCRExtracted ids by phash, highest id indexed)
+_phash_indexes: dict[str, tuple[BKTree, int]] = {}
+_phash_lock = threading.Lock()
+
+BATCH_ITEM_STATUSES = ('pending', 'done', 'failed', 'skipped')
+# Batches being run in this process; a second run of the same batch is refused
+_running_batches: set[str] = set()
+_running_lock = threading.Lock()
+
+
+def parse_image_ids(value) -> list[int]:
+    # Accept a JSON list or a comma-separated query string
+    if isinstance(value, str):
+        value = value.split(',')
+    ids = []
+    for v in value or []:
+        try:
+            ids.append(int(str(v).strip()))
+        except ValueError:
+            continue
+    return ids
+
+
+def _resolve_scope(filename: str, image_ids: list[int]) -> list[ExtractedImage]:
+    # Only images recorded by /extract-images are eligible for OCR
+    query = ExtractedImage.query
+    if filename:
+        query = query.filter_by(pdf_filename=filename)
+    if image_ids:
+        query = query.filter(ExtractedImage.id.in_(image_ids))
+    return query.order_by(ExtractedImage.page_number.asc(), ExtractedImage.id.asc()).all()
+
+
+def _find_cached(content_hash: str, config_hash: str) -> OCRExtracted | None:
+    return (
+        OCRExtracted.query.filter_by(content_hash=content_hash, config_hash=config_hash)
+        .order_by(OCRExtracted.id.desc())
+        .first()
+    )
+
+
+def _phash_index(config_hash: str) -> BKTree:
+    # Built once per process and config, then topped up with rows added since
+    with _phash_lock:
+        tree, last_id = _phash_indexes.get(config_hash) or (BKTree(), 0)
+        rows = (
+            db.session.query(OCRExtracted.id, OCRExtracted.phash)
+            .filter(
+                OCRExtracted.config_hash == config_hash,
+                OCRExtracted.phash.isnot(None),
+                OCRExtracted.id > last_id,
+            )
+            .order_by(OCRExtracted.id.asc())
+            .all()
+        )
+        for row_id, phash in rows:
+            tree.add(phash, row_id)
+            last_id = row_id
+        _phash_indexes[config_hash] = (tree, last_id)
+        return tree
+
+
+def _find_near(index: BKTree, phash: str, max_distance: int, path: str) -> OCRExtracted | None:
+    # Nearest stored row, from any PDF, whose pixels confirm the hash match
+    hits = index.search(phash, max_distance)
+    if not hits:
+        return None
+    # One query for every hit; ids of rows deleted by a forced recompute
+    # simply no longer resolve
+    rows = {
+        row.id: row
+        for row in OCRExtracted.query.filter(OCRExtracted.id.in_([i for _, i in hits])).all()
+    }
+    checked = set()  # each image file is confirmed at most once
+    for _, row_id in hits:
+        row = rows.get(row_id)
+        if row is None or row.image_name in checked:
+            continue
+        checked.add(row.image_name)
+        if _confirmed(path, os.path.join(IMAGES_ROOT, row.image_name)):
+            return row
+    return None
+
+
+def _confirmed(path: str, other: str) -> bool:
+    try:
+        return confirm_near(path, other)
+    except OSError:
+        return False
+
+
+def _image_phash(image: ExtractedImage, path: str) -> str | None:
+    # Rows extracted before phash existed get it computed (and saved) on first use
+    if not image.phash:
+        try:
+            image.phash = dhash(path)
+        except Exception:
+            return None
+    return image.phash
+
+
+def pipeline_options() -> dict:
+    return {
+        'mode': Config.OCR_MODE,
+        'cascade_min_conf': Config.OCR_CASCADE_MIN_CONF,
+        'cascade_min_chars': Config.OCR_CASCADE_MIN_CHARS,
+        'tesseract_backend': Config.TESSERACT_BACKEND,
+        'tesseract_lang': Config.TESSERACT_LANG,
+        'easyocr_batch_size': Config.OCR_EASYOCR_BATCH_SIZE,
+        'prefilter': Config.OCR_PREFILTER,
+        'prefilter_min_score': Config.OCR_PREFILTER_MIN_SCORE,
+        'preprocess_profile': Config.OCR_PREPROCESS_PROFILE,
+        'preprocess_cache_mb': Config.OCR_PREPROCESS_CACHE_MAX_MB,
+        'tile_min_pixels': int(Config.OCR_TILE_MIN_MEGAPIXELS * 1_000_000),
+        'tile_memory_mb': Config.OCR_TILE_MEMORY_MB,
+        'tile_workers': Config.OCR_TILE_WORKERS,
+        'script_detection': Config.OCR_SCRIPT_DETECTION,
+    }
+
+
+def _error_payload(image_name: str, page_number: int) -> dict:
+    return {
+        'image': image_name,
+        'page_number': page_number,
+        'error': 'Text not detected'
+    }
+
+
+def _checkpoint(
+    item: OCRBatchItem,
+    status: str,
+    ocr_id: int | None = None,
+    error: str | None = None,
+    transient: bool = False,
+):
+    # Caller commits, together with the OCRExtracted row the item points to
+    item.status = status
+    item.ocr_id = ocr_id
+    item.last_error = error
+    item.next_attempt_at = None
+    if status == 'failed':
+        item.attempts += 1
+        if not transient or item.attempts >= Config.OCR_MAX_ATTEMPTS:
+            # Deterministic errors (an unreadable image, a missing binary)
+            # would fail the same way again; no next_attempt_at means only
+            # resume_batch reruns the item
+            return
+        delay = Config.OCR_RETRY_BACKOFF_SECONDS * 2 ** (item.attempts - 1)
+        item.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+
+def _result_status(rec: OCRExtracted) -> str:
+    return 'skipped' if rec.skip_reason else 'done'
+
+
+def _process_items(
+    batch: OCRBatch,
+    items: list[OCRBatchItem],
+    images: dict[int, ExtractedImage],
+    own: dict[str, OCRExtracted],
+    config_hash: str,
+    options: dict,
+    results: dict[int, dict],
+    stats: dict,
+    report: Callable[[], None],
+):
+    """OCR the given batch items, checkpointing each one as it finishes.
+
+    own maps content hashes to rows this batch already produced, so a
+    resumed or retried item reuses them instead of storing a second row.
+    """
+    # Cache lookups on the calling thread; only misses go to the worker pool
+    todo = []  # (item, image, safe_name, content_hash)
+    followers = {}  # content_hash of a queued image -> [(item, image, safe_name, near)] copying it
+    batch_phashes = BKTree()  # phash -> (content_hash, path) of queued images
+    hashes = {}  # rows of a repeated xref share one file; hash it once
+    max_distance = Config.OCR_PHASH_MAX_DISTANCE
+    index = _phash_index(config_hash) if max_distance > 0 and not batch.force else None
+    for item in items:
+        image = images.get(item.image_id)
+        if image is None:
+            # Removed by a re-extraction
+            _checkpoint(item, 'failed', error='Extracted image no longer exists')
+            continue
+        safe_name = secure_filename(image.filename)
+        path = os.path.join(IMAGES_ROOT, safe_name)
+        try:
+            if safe_name not in hashes:
+                hashes[safe_name] = file_sha256(path)
+            content_hash = hashes[safe_name]
+        except OSError as e:
+            _checkpoint(item, 'failed', error=str(e))
+            results[item.id] = _error_payload(safe_name, image.page_number)
+            continue
+        cached = own.get(content_hash)
+        if cached is None and not batch.force:
+            cached = _find_cached(content_hash, config_hash)
+        if cached:
+            _checkpoint(item, _result_status(cached), cached.id)
+            payload = cached.to_payload(safe_name)
+            payload['page_number'] = image.page_number
+            results[item.id] = payload
+            stats['cache_hits'] += 1
+            continue
+        if content_hash in followers:
+            followers[content_hash].append((item, image, safe_name, False))
+            continue
+        phash = _image_phash(image, path) if max_distance > 0 else None
+        if phash and index is not None:
+            near = _find_near(index, phash, max_distance, path)
+            if near:
+                _checkpoint(item, _result_status(near), near.id)
+                payload = near.to_payload(safe_name)
+                payload['page_number'] = image.page_number
+                payload['near_duplicate_of'] = near.image_name
+                results[item.id] = payload
+                stats['near_hits'] += 1
+                continue
+        if phash:
+            candidates = batch_phashes.search(phash, max_distance)
+            leader = next(
+                (
+                    lead_hash
+                    for _, (lead_hash, lead_path) in candidates
+                    if _confirmed(path, lead_path)
+                ),
+                None,
+            )
+            if leader:
+                followers[leader].append((item, image, safe_name, True))
+                continue
+            batch_phashes.add(phash, (content_hash, path))
+        followers[content_hash] = []
+        todo.append((item, image, safe_name, content_hash))
+    db.session.commit()
+    report()
+
+    # Group similar-sized images (post-preprocess) so batched EasyOCR pads little;
+    # with a batch size of 1 every image is its own task
+    groups = group_by_size(
+        [processed_size(image.height, image.width) for _, image, _, _ in todo],
+        options['easyocr_batch_size'],
+    )
+    outcomes = iter_ordered(
+        process_group,
+        [
+            (
+                [(os.path.join(IMAGES_ROOT, todo[k][2]), todo[k][2]) for k in group],
+                IMAGES_ROOT,
+                options,
+            )
+            for group in groups
+        ],
+        workers=Config.OCR_WORKERS,
+        timeout=Config.OCR_IMAGE_TIMEOUT_SECONDS * max((len(g) for g in groups), default=1),
+    )
+    for group, (ok, payloads) in zip(groups, outcomes):
+        if not ok:
+            # A timed-out or killed worker (e.g. out of memory) may well
+            # succeed next time; other pool errors would repeat
+            transient = isinstance(payloads, TRANSIENT_ERRORS + LOST_TASK_ERRORS)
+            payloads = [{'error': str(payloads), 'transient': transient}] * len(group)
+        for k, payload in zip(group, payloads):
+            item, image, safe_name, content_hash = todo[k]
+            if 'error' in payload:
+                transient = payload.get('transient', False)
+                for it, img, name, _ in [(item, image, safe_name, False), *followers[content_hash]]:
+                    _checkpoint(it, 'failed', error=payload['error'], transient=transient)
+                    results[it.id] = _error_payload(name, img.page_number)
+                db.session.commit()
+                try:
+                    current_app.logger.error('ocr_extraction failed', extra={'context': {
+                        'batch_id': batch.id,
+                        'image': safe_name,
+                        'attempt': item.attempts,
+                        'error': payload['error'],
+                    }})
+                except Exception:
+                    pass
+                continue
+            payload['page_number'] = image.page_number
+            # Store (a forced recompute replaces the previous row for this image)
+            if batch.force:
+                OCRExtracted.query.filter_by(
+                    image_name=safe_name, content_hash=content_hash, config_hash=config_hash
+                ).delete()
+            rec = OCRExtracted(
+                image_name=safe_name,
+                category=payload.get('category'),
+                extracted_text=payload.get('raw_text'),
+                structured_json=json.dumps(payload.get('details', {}), ensure_ascii=False),
+                content_hash=content_hash,
+                config_hash=config_hash,
+                engines=','.join(payload.get('engines', [])),
+                skip_reason=payload.get('skip_reason'),
+                phash=image.phash,
+            )
+            db.session.add(rec)
+            db.session.flush()
+            own[content_hash] = rec
+            _checkpoint(item, _result_status(rec), rec.id)
+            results[item.id] = payload
+            for it, img, name, near in followers[content_hash]:
+                _checkpoint(it, _result_status(rec), rec.id)
+                results[it.id] = {**payload, 'image': name, 'page_number': img.page_number}
+                if near:
+                    results[it.id]['near_duplicate_of'] = safe_name
+                    stats['near_hits'] += 1
+                else:
+                    stats['cache_hits'] += 1
+            # The row and the status of every item it serves land in one commit
+            db.session.commit()
+        report()
+
+
+def _batch_counts(items: list[OCRBatchItem]) -> dict:
+    counts = {s: 0 for s in BATCH_ITEM_STATUSES}
+    for item in items:
+        counts[item.status] = counts.get(item.status, 0) + 1
+    return counts
+
+
+def create_batch(filename: str, image_ids: list[int], force: bool = False) -> Tuple[dict, int]:
+    """Record an OCR batch with one pending item per image in scope."""
+    filename = secure_filename(filename or '')
+    if not filename and not image_ids:
+        return {'status': 'error', 'message': 'filename or image_ids required'}, 400
+    if filename:
+        filename = content_source(filename)
+
+    records = _resolve_scope(filename, image_ids)
+    if not records:
+        return {
+            'status': 'error', 'message': 'No extracted images found for the requested scope',
+        }, 400
+
+    batch = OCRBatch(
+        id=uuid.uuid4().hex,
+        filename=filename or None,
+        image_ids_json=json.dumps(image_ids),
+        force=force,
+        status='pending',
+    )
+    db.session.add(batch)
+    db.session.flush()
+    db.session.execute(
+        insert(OCRBatchItem),
+        [
+            {'batch_id': batch.id, 'image_id': image.id, 'position': n,
+             'status': 'pending', 'attempts': 0}
+            for n, image in enumerate(records)
+        ],
+    )
+    db.session.commit()
+    try:
+        current_app.logger.info('ocr_batch created', extra={'context': {
+            'batch_id': batch.id, 'file': filename, 'images': len(records),
+        }})
+    except Exception:
+        pass
+    return {'status': 'success', 'batch_id': batch.id, 'images': len(records)}, 201
+
+
+def run_batch(
+    batch_id: str,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+    wait_for_retries: bool = False,
+) -> Tuple[dict, int]:
+    """OCR the items of a batch that are not finished yet.
+
+    Pending items run first, then failed items that still have attempts
+    left. Only transient failures keep attempts (out of memory, a timed-out
+    or killed worker); deterministic errors fail for good until
+    resume_batch. With wait_for_retries (the background job path)
+    transient failures are retried after the rest of the batch with
+    exponential backoff, up to OCR_MAX_ATTEMPTS; otherwise the call never
+    sleeps and returns the batch as 'partial'. Each finished
+    image is committed as it completes, so after a crash the batch can be
+    run again and only the remaining images are processed.
+    Returns (response_body, http_status); progress(stage, done, total) is
+    called as images complete.
+    """
+    batch = db.session.get(OCRBatch, batch_id)
+    if batch is None:
+        return {'status': 'error', 'message': 'OCR batch not found'}, 404
+    with _running_lock:
+        if batch_id in _running_batches:
+            return {'status': 'error', 'message': 'OCR batch is already running'}, 409
+        _running_batches.add(batch_id)
+    try:
+        return _run_batch(batch, progress, wait_for_retries)
+    finally:
+        with _running_lock:
+            _running_batches.discard(batch_id)
+
+
+def _batch_items(batch_id: str) -> list[OCRBatchItem]:
+    return (
+        OCRBatchItem.query.filter_by(batch_id=batch_id)
+        .order_by(OCRBatchItem.position.asc())
+        .all()
+    )
+
+
+def _retry_pending(item: OCRBatchItem) -> bool:
+    # Failed items keep next_attempt_at only while they have attempts left
+    return item.status == 'failed' and item.next_attempt_at is not None
+
+
+def _run_batch(batch: OCRBatch, progress, wait_for_retries: bool) -> Tuple[dict, int]:
+    start = time.time()
+    items = _batch_items(batch.id)
+    image_ids = [item.image_id for item in items]
+    images = {
+        image.id: image
+        for image in ExtractedImage.query.filter(ExtractedImage.id.in_(image_ids)).all()
+    }
+    remaining = [item for item in items if item.status == 'pending' or _retry_pending(item)]
+    try:
+        current_app.logger.info('ocr_extraction started', extra={'context': {
+            'batch_id': batch.id,
+            'file': batch.filename,
+            'images': len(items),
+            'remaining': len(remaining),
+        }})
+    except Exception:
+        pass
+    batch.status = 'running'
+    db.session.commit()
+
+    os.makedirs(IMAGES_ROOT, exist_ok=True)
+    ensure_processed_dir(IMAGES_ROOT)
+    options = pipeline_options()
+    config_hash = ocr_config_fingerprint(
+        DEFAULT_ENGINES, {**PREPROCESS_PARAMS, 'prefilter': PREFILTER_PARAMS}, options
+    )
+    done_ids = [item.ocr_id for item in items if item.ocr_id]
+    own = {
+        rec.content_hash: rec
+        for rec in OCRExtracted.query.filter(
+            OCRExtracted.id.in_(done_ids), OCRExtracted.config_hash == config_hash
+        ).all()
+    } if done_ids else {}
+
+    results: dict[int, dict] = {}  # item id -> payload produced by this run
+    stats = {'cache_hits': 0, 'near_hits': 0}
+    total = len(items)
+
+    def report():
+        if progress:
+            progress('images', sum(1 for item in items if item.status != 'pending'), total)
+
+    report()
+    _process_items(batch, remaining, images, own, config_hash, options, results, stats, report)
+    while wait_for_retries:
+        retry = [item for item in items if _retry_pending(item)]
+        if not retry:
+            break
+        wait = (min(item.next_attempt_at for item in retry) - datetime.utcnow()).total_seconds()
+        if wait > 0:
+            time.sleep(wait)
+        now = datetime.utcnow()
+        due = [item for item in retry if item.next_attempt_at <= now]
+        _process_items(batch, due, images, own, config_hash, options, results, stats, report)
+
+    # Items finished by an earlier run answer from their stored rows
+    stored_ids = [i.ocr_id for i in items if i.ocr_id and i.id not in results]
+    rows = {rec.id: rec for rec in OCRExtracted.query.filter(OCRExtracted.id.in_(stored_ids)).all()}
+    data = []
+    for item in items:
+        payload = results.get(item.id)
+        if payload is None:
+            image = images.get(item.image_id)
+            name = secure_filename(image.filename) if image else ''
+            page_number = image.page_number if image else None
+            rec = rows.get(item.ocr_id)
+            if item.status in ('done', 'skipped') and rec is not None:
+                payload = rec.to_payload(name)
+                payload['page_number'] = page_number
+            else:
+                payload = _error_payload(name, page_number)
+        data.append(payload)
+
+    counts = _batch_counts(items)
+    batch.status = 'partial' if counts['failed'] else 'done'
+    batch.finished_at = datetime.utcnow()
+    db.session.commit()
+
+    duration_ms = round((time.time() - start) * 1000)
+    try:
+        current_app.logger.info('ocr_extraction completed', extra={'context': {
+            'batch_id': batch.id,
+            'file': batch.filename,
+            'count': len(data),
+            'failed': counts['failed'],
+            'cache_hits': stats['cache_hits'],
+            'near_duplicate_hits': stats['near_hits'],
+            'duration_ms': duration_ms,
+        }})
+    except Exception:
+        pass
+    return {
+        'status': 'success',
+        'message': 'OCR complete',
+        'batch_id': batch.id,
+        'batch_status': batch.status,
+        'counts': counts,
+        'cache_hits': stats['cache_hits'],
+        'near_duplicate_hits': stats['near_hits'],
+        'data': data,
+    }, 200
+
+
+def resume_batch(
+    batch_id: str,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+    wait_for_retries: bool = False,
+) -> Tuple[dict, int]:
+    """Run a batch again for its pending and failed items; failed ones get a
+    fresh set of attempts."""
+    batch = db.session.get(OCRBatch, batch_id)
+    if batch is None:
+        return {'status': 'error', 'message': 'OCR batch not found'}, 404
+    OCRBatchItem.query.filter_by(batch_id=batch_id, status='failed').update(
+        {'status': 'pending', 'attempts': 0, 'next_attempt_at': None}, synchronize_session=False
+    )
+    db.session.commit()
+    return run_batch(batch_id, progress, wait_for_retries)
+
+
+def get_batch(batch_id: str) -> Tuple[dict, int]:
+    batch = db.session.get(OCRBatch, batch_id)
+    if batch is None:
+        return {'status': 'error', 'message': 'OCR batch not found'}, 404
+    items = _batch_items(batch_id)
+    data = batch.to_dict(_batch_counts(items))
+    data['items'] = [
+        {
+            'image_id': item.image_id,
+            'status': item.status,
+            'attempts': item.attempts,
+            'error': item.last_error,
+        }
+        for item in items
+    ]
+    return {'status': 'success', 'batch': data}, 200
+
+
+def run_ocr(
+    filename: str,
+    image_ids: list[int],
+    force: bool = False,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+    wait_for_retries: bool = False,
+) -> Tuple[dict, int]:
+    """OCR the extracted images of one PDF (or the given image ids) as a new batch.
+
+    Returns (response_body, http_status); the body carries batch_id, which
+    resume_batch accepts if the run is interrupted or ends 'partial'.
+    """
+    body, status = create_batch(filename, image_ids, force)
+    if status >= 400:
+        return body, status
+    return run_batch(body['batch_id'], progress, wait_for_retries)
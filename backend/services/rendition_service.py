@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+from typing import Tuple, Union
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+from PIL import Image
+
+from config import Config
+from db import db
+from models.extracted_image import ExtractedImage
+
+IMAGES_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static', 'images'))
+RENDITIONS_DIR = os.path.join(IMAGES_ROOT, 'renditions')
+
+# Requested widths snap up to one of these so the cache stays small
+RENDITION_WIDTHS = (160, 320, 640, 1280, 1920)
+RENDITION_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+}
+
+_evict_lock = threading.Lock()
+
+
+def snap_width(width: int, source_width: int) -> int:
+    # Smallest allowed width >= requested, never wider than the source
+    for w in RENDITION_WIDTHS:
+        if w >= width:
+            return min(w, source_width)
+    return min(RENDITION_WIDTHS[-1], source_width)
+
+
+def _render(src_path: str, out_path: str, width: int, pil_format: str):
+    with Image.open(src_path) as img:
+        img.load()
+        if img.width > width:
+            img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+        if pil_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        elif img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            img = img.convert('RGBA')
+        # Write to a temp name so concurrent readers never see a partial file
+        tmp_path = f"{out_path}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, format=pil_format, quality=82)
+    os.replace(tmp_path, out_path)
+
+
+def _evict(max_bytes: int, keep: str):
+    # Least recently used first (hits refresh atime); never the file just served
+    with _evict_lock:
+        entries = []
+        for name in os.listdir(RENDITIONS_DIR):
+            fp = os.path.join(RENDITIONS_DIR, name)
+            try:
+                st = os.stat(fp)
+            except OSError:
+                continue
+            entries.append((st.st_atime, st.st_size, fp))
+        total = sum(size for _, size, _ in entries)
+        for _, size, fp in sorted(entries):
+            if total <= max_bytes:
+                break
+            if fp == keep:
+                continue
+            try:
+                os.remove(fp)
+                total -= size
+            except OSError:
+                pass
+
+
+def get_rendition(image_id: int, width: int, fmt: str) -> Tuple[Union[str, dict], Union[str, int]]:
+    """Path of a cached (or freshly rendered) rendition of an extracted image.
+
+    Returns (path, mimetype) on success or (error_body, http_status).
+    """
+    fmt = (fmt or 'webp').lower()
+    if fmt == 'jpg':
+        fmt = 'jpeg'
+    if fmt not in RENDITION_FORMATS:
+        message = f"fmt must be one of {', '.join(RENDITION_FORMATS)}"
+        return {'status': 'error', 'message': message}, 400
+    if width <= 0:
+        return {'status': 'error', 'message': 'w must be a positive integer'}, 400
+
+    rec = db.session.get(ExtractedImage, image_id)
+    if not rec:
+        return {'status': 'error', 'message': 'Image not found'}, 404
+    src_name = secure_filename(rec.filename)
+    src_path = os.path.join(IMAGES_ROOT, src_name)
+    if not os.path.exists(src_path):
+        return {'status': 'error', 'message': 'Image file missing'}, 404
+
+    pil_format, mimetype = RENDITION_FORMATS[fmt]
+    width = snap_width(width, rec.width)
+    # Keyed by source file, so placements sharing one file share renditions
+    stem, _ = os.path.splitext(src_name)
+    out_path = os.path.join(RENDITIONS_DIR, f"{stem}_w{width}.{fmt}")
+
+    if os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(src_path):
+        # Bump only atime: mtime feeds the ETag/Last-Modified of the response
+        try:
+            os.utime(out_path, (time.time(), os.path.getmtime(out_path)))
+        except OSError:
+            pass
+        return out_path, mimetype
+
+    os.makedirs(RENDITIONS_DIR, exist_ok=True)
+    try:
+        _render(src_path, out_path, width, pil_format)
+    except Exception:
+        current_app.logger.error('rendition failed', extra={"context": {
+            "image": src_name, "width": width, "fmt": fmt,
+        }})
+        return {'status': 'error', 'message': 'Failed to render image'}, 500
+    _evict(Config.RENDITION_CACHE_MAX_MB * 1024 * 1024, out_path)
+    return out_path, mimetype
@@ -0,0 +1,361 @@
+import os
+import json
+import time
+import hashlib
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, Optional, Tuple, Union
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+from config import Config
+from db import db
+from models.extracted_text import ExtractedText
+from models.extracted_page import ExtractedPage
+from models.pdf_model import PDFUpload
+from extraction.engines import count_pages, extract_page_texts, page_fingerprints
+from extraction.clean import clean_text
+from extraction.structure import structure_text
+from ocr.engines import DEFAULT_ENGINES
+from ocr.preprocess import PREPROCESS_PARAMS
+from ocr.utils import ocr_config_fingerprint
+from services.ocr_service import pipeline_options
+from services.upload_service import content_source
+
+TEMP_DIR = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), '..', 'static', 'uploads', 'temp'
+)
+TEMP_DIR = os.path.abspath(TEMP_DIR)
+
+
+def _resolve_pdf_path(filename: str) -> str:
+    # Try main uploads dir first, then temp dir
+    candidates = [
+        os.path.join(Config.UPLOAD_FOLDER, filename),
+        os.path.join(TEMP_DIR, filename),
+    ]
+    for p in candidates:
+        ap = os.path.abspath(p)
+        # ensure under uploads root
+        if ap.startswith(os.path.dirname(Config.UPLOAD_FOLDER)) and os.path.exists(ap):
+            return ap
+    return ''
+
+
+def _orphaned_page_files() -> list[str]:
+    # Filenames with stored pages but no upload row and no file left on disk
+    stored = {name for (name,) in db.session.query(ExtractedPage.filename).distinct()}
+    if not stored:
+        return []
+    uploaded = {
+        name for (name,) in
+        db.session.query(PDFUpload.filename).filter(PDFUpload.filename.in_(stored))
+    }
+    return [name for name in stored - uploaded if not _resolve_pdf_path(name)]
+
+
+def _purge_temp_and_db():
+    try:
+        cutoff = datetime.utcnow() - timedelta(hours=24)
+        # Files purge
+        if os.path.isdir(TEMP_DIR):
+            for f in os.listdir(TEMP_DIR):
+                fp = os.path.join(TEMP_DIR, f)
+                try:
+                    if os.path.isfile(fp):
+                        mtime = datetime.utcfromtimestamp(os.path.getmtime(fp))
+                        if mtime < cutoff:
+                            os.remove(fp)
+                except Exception:
+                    pass
+        # DB purge; per-page rows are the source of truth for re-extraction,
+        # so they go only once their upload is gone, whatever their age
+        ExtractedText.query.filter(ExtractedText.created_at < cutoff).delete()
+        orphans = _orphaned_page_files()
+        if orphans:
+            ExtractedPage.query.filter(ExtractedPage.filename.in_(orphans)).delete(
+                synchronize_session=False
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+
+
+def _hybrid_options() -> Optional[dict]:
+    if not Config.TEXT_HYBRID_OCR:
+        return None
+    return {
+        'min_chars': Config.TEXT_LAYER_MIN_CHARS,
+        'dpi': Config.TEXT_HYBRID_DPI,
+        'options': pipeline_options(),
+        # Page OCR shares the OCR pool (and its per-task timeout)
+        'workers': Config.OCR_WORKERS,
+        'timeout': Config.OCR_IMAGE_TIMEOUT_SECONDS,
+    }
+
+
+def _hybrid_fingerprint(ocr: Optional[dict]) -> Optional[str]:
+    if ocr is None:
+        return None
+    params = {**PREPROCESS_PARAMS, 'min_chars': ocr['min_chars'], 'dpi': ocr['dpi']}
+    return ocr_config_fingerprint(DEFAULT_ENGINES, params, ocr['options'])
+
+
+def iter_synced_pages(
+    filename: str,
+    path: str,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+) -> Iterator[ExtractedPage]:
+    """Bring the ExtractedPage rows of a PDF up to date and yield them in page order.
+
+    Only pages whose content fingerprint changed (or that have no row yet)
+    are extracted and cleaned again; the rest are served from their rows.
+    With TEXT_HYBRID_OCR, scanned pages without a text layer are OCR'd.
+    Commits once all pages are done.
+    """
+    fingerprints = page_fingerprints(path)
+    total = len(fingerprints) if fingerprints is not None else count_pages(path)
+    existing = {r.page_number: r for r in ExtractedPage.query.filter_by(filename=filename).all()}
+    for number, row in existing.items():
+        if number > total:
+            db.session.delete(row)
+
+    ocr = _hybrid_options()
+    ocr_config = _hybrid_fingerprint(ocr)
+
+    def stale_row(n: int) -> bool:
+        row = existing.get(n)
+        if row is None or fingerprints is None or row.content_hash != fingerprints[n - 1]:
+            return True
+        # Text-less pages get another try only under a different hybrid OCR
+        # config (or once it is enabled), not every time OCR found nothing
+        return ocr is not None and not row.has_text_layer and row.ocr_config != ocr_config
+
+    changed = [n for n in range(1, total + 1) if stale_row(n)]
+    workers = Config.TEXT_WORKERS if len(changed) >= Config.TEXT_PARALLEL_MIN_PAGES else 0
+    fresh = extract_page_texts(path, Config.TEXT_ENGINE, changed, workers, ocr)
+    pending = next(fresh, None)
+
+    for number in range(1, total + 1):
+        while pending is not None and pending[0] < number:
+            pending = next(fresh, None)
+        row = existing.get(number)
+        if pending is not None and pending[0] == number:
+            raw, ocr_used = pending[1], pending[2]
+            cleaned = clean_text(raw)
+            if row is None:
+                row = ExtractedPage(filename=filename, page_number=number)
+                db.session.add(row)
+            row.text = cleaned
+            row.char_count = len(cleaned)
+            row.has_text_layer = not ocr_used and len(cleaned) >= Config.TEXT_LAYER_MIN_CHARS
+            row.source = 'ocr' if ocr_used else 'text'
+            row.ocr_config = ocr_config
+            row.content_hash = (
+                fingerprints[number - 1] if fingerprints is not None
+                else hashlib.sha256(raw.encode('utf-8')).hexdigest()
+            )
+        if progress:
+            progress('pages', number, total)
+        if row is not None:
+            yield row
+    db.session.commit()
+
+
+def _assemble(rows: list[ExtractedPage]) -> str:
+    return "\n\n".join(r.text for r in rows if r.text)
+
+
+def _cached_result(filename: str) -> Optional[dict]:
+    existing = (
+        ExtractedText.query.filter_by(filename=filename)
+        .order_by(ExtractedText.id.desc())
+        .first()
+    )
+    if not existing:
+        return None
+    try:
+        data = json.loads(existing.structured_data)
+    except Exception:
+        data = {}
+    return {
+        'status': 'success',
+        'message': 'Text fetched successfully',
+        'data': data,
+        'raw_text_length': len(existing.raw_text or '')
+    }
+
+
+def _store_result(filename: str, cleaned: str, structured: dict):
+    # One ExtractedText row per document; re-extraction replaces it
+    ExtractedText.query.filter_by(filename=filename).delete()
+    rec = ExtractedText(
+        filename=filename,
+        raw_text=cleaned,
+        structured_data=json.dumps(structured, ensure_ascii=False),
+    )
+    db.session.add(rec)
+    db.session.commit()
+
+    # Purge (best-effort)
+    _purge_temp_and_db()
+
+
+def extract_pdf_text(
+    filename: str,
+    reextract: bool = False,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+) -> Tuple[dict, int]:
+    """Extract, clean and structure the text of an uploaded PDF.
+
+    The response is assembled from the per-page rows; reextract=True
+    re-checks every page and redoes only the ones whose content changed.
+    Returns (response_body, http_status); progress(stage, done, total)
+    reports pages.
+    """
+    start = time.time()
+    # Use werkzeug secure_filename and ensure no path traversal remains
+    filename = secure_filename(filename or '')
+    if not filename:
+        return {'status': 'error', 'message': 'filename query param required'}, 400
+    # Duplicate uploads share the results of the first upload with the same bytes
+    filename = content_source(filename)
+
+    # Fast path: return existing if present
+    cached = None if reextract else _cached_result(filename)
+    if cached:
+        duration = round((time.time() - start) * 1000)
+        current_app.logger.info('extract fetch cached', extra={"context": {
+            "file": filename, "duration_ms": duration,
+        }})
+        return cached, 200
+
+    # Resolve path
+    path = _resolve_pdf_path(filename)
+    if not path:
+        return {'status': 'error', 'message': 'File not found'}, 400
+
+    # Extraction
+    try:
+        rows = list(iter_synced_pages(filename, path, progress))
+        cleaned = _assemble(rows)
+        structured = structure_text(cleaned)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.error('extract failed', extra={"context": {"file": filename}})
+        return {'status': 'error', 'message': 'Failed to extract text from PDF'}, 500
+
+    _store_result(filename, cleaned, structured)
+
+    duration = round((time.time() - start) * 1000)
+    current_app.logger.info('extract success', extra={"context": {
+        "file": filename, "pages": len(rows), "duration_ms": duration,
+    }})
+    return {
+        'status': 'success',
+        'message': 'Text extracted successfully',
+        'data': structured,
+        'raw_text_length': len(cleaned)
+    }, 200
+
+
+def get_pages(
+    filename: str, start_page: int = 1, end_page: Optional[int] = None
+) -> Tuple[dict, int]:
+    """Stored page rows in [start_page, end_page]; extracts the document first
+    if it has no page rows yet."""
+    filename = secure_filename(filename or '')
+    if not filename:
+        return {'status': 'error', 'message': 'filename query param required'}, 400
+    filename = content_source(filename)
+
+    if not ExtractedPage.query.filter_by(filename=filename).first():
+        path = _resolve_pdf_path(filename)
+        if not path:
+            return {'status': 'error', 'message': 'File not found'}, 400
+        try:
+            for _ in iter_synced_pages(filename, path):
+                pass
+        except Exception:
+            db.session.rollback()
+            current_app.logger.error('extract pages failed', extra={"context": {"file": filename}})
+            return {'status': 'error', 'message': 'Failed to extract text from PDF'}, 500
+
+    query = ExtractedPage.query.filter_by(filename=filename).filter(
+        ExtractedPage.page_number >= start_page
+    )
+    if end_page is not None:
+        query = query.filter(ExtractedPage.page_number <= end_page)
+    rows = query.order_by(ExtractedPage.page_number.asc()).all()
+    total = ExtractedPage.query.filter_by(filename=filename).count()
+    return {
+        'status': 'success',
+        'filename': filename,
+        'total_pages': total,
+        'pages': [r.to_dict() for r in rows],
+    }, 200
+
+
+def _ndjson(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def stream_pdf_text(
+    filename: str, reextract: bool = False
+) -> Tuple[Union[Iterator[str], dict], int]:
+    """Streaming variant of extract_pdf_text.
+
+    Returns (lines, 200) where lines yields one NDJSON record per page as it
+    is extracted and cleaned, then a final result record; or
+    (error_body, status) when the request can be rejected up front.
+    """
+    start = time.time()
+    filename = secure_filename(filename or '')
+    if not filename:
+        return {'status': 'error', 'message': 'filename query param required'}, 400
+    filename = content_source(filename)
+
+    cached = None if reextract else _cached_result(filename)
+    if cached:
+        return iter([_ndjson({'type': 'result', **cached})]), 200
+
+    path = _resolve_pdf_path(filename)
+    if not path:
+        return {'status': 'error', 'message': 'File not found'}, 400
+    return _stream_pages(filename, path, start), 200
+
+
+def _stream_pages(filename: str, path: str, start: float) -> Iterator[str]:
+    # Only cleaned page text is kept (for structuring and storage); the raw
+    # document text is never held in full
+    rows = []
+    try:
+        total = count_pages(path)
+        for row in iter_synced_pages(filename, path):
+            rows.append(row)
+            yield _ndjson({
+                'type': 'page', 'page': row.page_number, 'total_pages': total, 'text': row.text,
+            })
+        cleaned = _assemble(rows)
+        structured = structure_text(cleaned)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.error('extract stream failed', extra={"context": {"file": filename}})
+        yield _ndjson({
+            'type': 'error', 'status': 'error', 'message': 'Failed to extract text from PDF',
+        })
+        return
+
+    _store_result(filename, cleaned, structured)
+
+    duration = round((time.time() - start) * 1000)
+    current_app.logger.info('extract stream success', extra={"context": {
+        "file": filename, "pages": len(rows), "duration_ms": duration,
+    }})
+    yield _ndjson({
+        'type': 'result',
+        'status': 'success',
+        'message': 'Text extracted successfully',
+        'data': structured,
+        'raw_text_length': len(cleaned),
+    })
@@ -0,0 +1,608 @@
+import os
+import hashlib
+import json
+import threading
+import uuid
+import zipfile
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import and_, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+from config import Config
+from db import db
+from models.job import Job
+from models.pdf_model import PDFUpload
+from models.upload_batch import UploadBatch
+from models.upload_session import UploadSession
+from ocr.utils import file_sha256
+
+CHUNK_SIZE = 1024 * 1024
+PDF_MAGIC = b'%PDF'
+MAX_HASHERS = 256
+# A session stays 'writing' while one request appends a chunk; a claim older
+# than this is taken to belong to a request that died mid-chunk
+WRITE_CLAIM_STALE_SECONDS = 600
+
+# filename -> sha256 of uploads stored before hashing; hashed once per process
+_legacy_hashes: dict[str, str] = {}
+_legacy_lock = threading.Lock()
+# upload session id -> (offset, running sha256) so chunks are hashed as they arrive
+_hashers: OrderedDict = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+def _temp_dir() -> str:
+    # Part files live with the other temp uploads and are purged with them after 24h
+    path = os.path.join(Config.UPLOAD_FOLDER, 'temp')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _max_bytes() -> int:
+    return Config.UPLOAD_MAX_MB * 1024 * 1024
+
+
+def too_large() -> Tuple[dict, int]:
+    return {'error': f'File too large (max {Config.UPLOAD_MAX_MB}MB)'}, 413
+
+
+def _unique_rename(dest_dir: str, filename: str) -> str:
+    name, ext = os.path.splitext(filename)
+    i = 1
+    candidate = filename
+    while os.path.exists(os.path.join(dest_dir, candidate)):
+        candidate = f"{name}({i}){ext}"
+        i += 1
+    return candidate
+
+
+def _upload_body(upload: PDFUpload, duplicate: bool) -> dict:
+    return {
+        'status': 'success',
+        'filename': upload.filename,
+        'path': upload.path,
+        'size': upload.size,
+        'sha256': upload.sha256,
+        'duplicate': duplicate,
+        'uploaded_at': str(upload.upload_date),
+    }
+
+
+def _discard(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _copy_checked(
+    stream, out, h, offset: int, limit: int, head: bytes = b''
+) -> Tuple[int, Optional[str]]:
+    """Copy stream into out (positioned at offset) in CHUNK_SIZE reads.
+
+    The PDF header check, size limit and hashing happen on the same pass
+    as the write; head holds the file's bytes before offset, if any of the
+    header is already written. Returns (total_size, problem) where problem
+    is None, 'invalid' or 'too_large'; copying stops at the first problem.
+    """
+    size = offset
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        if size < len(PDF_MAGIC):
+            head += chunk[:len(PDF_MAGIC) - size]
+            if not PDF_MAGIC.startswith(head):
+                return size, 'invalid'
+        size += len(chunk)
+        if size > limit:
+            return size, 'too_large'
+        h.update(chunk)
+        out.write(chunk)
+    return size, None
+
+
+def _store_file(
+    tmp_path: str, sha: str, original_name: str, session: UploadSession | None = None
+) -> Tuple[dict, int]:
+    # Move a fully received file into uploads and record it, unless its bytes are already stored
+    uploads_dir = Config.UPLOAD_FOLDER
+    existing = PDFUpload.query.filter_by(sha256=sha).first()
+    if existing is None:
+        filename = _unique_rename(uploads_dir, secure_filename(original_name))
+        file_path = os.path.join(uploads_dir, filename)
+        os.replace(tmp_path, file_path)
+        size_mb = round(os.path.getsize(file_path) / (1024 * 1024), 2)
+        upload = PDFUpload(
+            filename=filename, size=size_mb, path=f"/static/uploads/{filename}", sha256=sha
+        )
+        db.session.add(upload)
+        try:
+            db.session.flush()
+            if session is not None:
+                session.status = 'complete'
+                session.upload_id = upload.id
+            db.session.commit()
+        except IntegrityError:
+            # Same bytes committed by a concurrent upload
+            db.session.rollback()
+            _discard(file_path)
+            existing = PDFUpload.query.filter_by(sha256=sha).first()
+        else:
+            current_app.logger.info('upload success', extra={"context": {
+                "file": filename, "size_mb": size_mb, "sha256": sha,
+            }})
+            return _upload_body(upload, duplicate=False), 200
+
+    _discard(tmp_path)
+    if session is not None:
+        session.status = 'complete'
+        session.upload_id = existing.id
+        db.session.commit()
+    current_app.logger.info('upload duplicate', extra={"context": {
+        "file": existing.filename, "sha256": sha,
+    }})
+    return _upload_body(existing, duplicate=True), 200
+
+
+def _receive(stream, limit: int) -> Tuple[str | None, str | None, Tuple[dict, int] | None]:
+    # Write stream to a temp file in one checked pass;
+    # (tmp_path, sha256, None) or (None, None, error)
+    tmp_path = os.path.join(_temp_dir(), f".{uuid.uuid4().hex}.part")
+    h = hashlib.sha256()
+    try:
+        with open(tmp_path, 'wb') as out:
+            size, problem = _copy_checked(stream, out, h, 0, limit)
+    except RequestEntityTooLarge:
+        _discard(tmp_path)
+        return None, None, too_large()
+    except Exception:
+        _discard(tmp_path)
+        current_app.logger.error('file save failed', extra={"context": {"path": tmp_path}})
+        return None, None, ({'error': 'Upload failed. Please try again.'}, 500)
+    if problem or size < len(PDF_MAGIC):
+        _discard(tmp_path)
+        if problem == 'too_large':
+            return None, None, too_large()
+        return None, None, ({'error': 'Invalid PDF content'}, 400)
+    return tmp_path, h.hexdigest(), None
+
+
+def save_upload(stream, original_name: str) -> Tuple[dict, int]:
+    """Store an uploaded PDF in one pass over the stream.
+
+    The header check, size limit and SHA-256 run while the bytes are
+    written; an oversized or non-PDF body is abandoned at the first chunk
+    that shows it. An upload whose bytes match an earlier one is discarded
+    and the earlier record returned (duplicate=True), so its extraction
+    results are reused.
+    """
+    tmp_path, sha, error = _receive(stream, _max_bytes())
+    if error:
+        return error
+    return _store_file(tmp_path, sha, original_name)
+
+
+def iter_batch_files(files) -> Iterator[Tuple[str, object | None, str | None]]:
+    """(name, stream, error) for each PDF of a batch upload: every uploaded
+    .pdf, and every .pdf member of an uploaded .zip (read without unpacking
+    the archive to disk)."""
+    for f in files:
+        name = f.filename or ''
+        ext = os.path.splitext(name)[1].lower()
+        if ext == '.pdf':
+            yield name, f.stream, None
+            continue
+        if ext != '.zip':
+            yield name, None, 'Only PDF files are allowed'
+            continue
+        try:
+            archive = zipfile.ZipFile(f.stream)
+        except zipfile.BadZipFile:
+            yield name, None, 'Invalid zip archive'
+            continue
+        with archive:
+            for info in archive.infolist():
+                if info.is_dir() or info.filename.startswith('__MACOSX/'):
+                    continue
+                member = os.path.basename(info.filename)
+                if os.path.splitext(member)[1].lower() != '.pdf':
+                    yield member, None, 'Only PDF files are allowed'
+                elif info.file_size > _max_bytes():
+                    yield member, None, too_large()[0]['error']
+                else:
+                    with archive.open(info) as stream:
+                        yield member, stream, None
+
+
+def save_uploads(files) -> Tuple[dict, int]:
+    """Store a batch of uploaded PDFs (see iter_batch_files).
+
+    Each file gets the same single-pass checks and content-hash dedupe as
+    save_upload; new uploads are inserted in one statement. The response
+    lists a status per file: stored, duplicate or rejected.
+    """
+    entries = []
+    budget = Config.UPLOAD_BATCH_MAX_MB * 1024 * 1024
+    accepted = 0
+    for name, stream, error in iter_batch_files(files):
+        if not error and not secure_filename(name):
+            error = 'Invalid filename'
+        if not error and accepted >= Config.UPLOAD_BATCH_MAX_FILES:
+            error = f'Too many files in batch (max {Config.UPLOAD_BATCH_MAX_FILES})'
+        if not error:
+            # Unpacked archive members count against the batch size too
+            tmp_path, sha, failure = _receive(stream, min(_max_bytes(), budget))
+            if failure:
+                error = failure[0]['error']
+            else:
+                accepted += 1
+                budget -= os.path.getsize(tmp_path)
+                entries.append({'name': name, 'status': 'stored', 'sha256': sha, '_tmp': tmp_path})
+                continue
+        entries.append({'name': name, 'status': 'rejected', 'error': error})
+
+    received = [e for e in entries if '_tmp' in e]
+    shas = {e['sha256'] for e in received}
+    existing = set()
+    if shas:
+        existing = {u.sha256 for u in PDFUpload.query.filter(PDFUpload.sha256.in_(shas)).all()}
+    rows = []
+    for e in received:
+        tmp_path = e.pop('_tmp')
+        if e['sha256'] in existing:
+            # Already stored, or earlier in this batch
+            _discard(tmp_path)
+            e['status'] = 'duplicate'
+            continue
+        existing.add(e['sha256'])
+        filename = _unique_rename(Config.UPLOAD_FOLDER, secure_filename(e['name']))
+        file_path = os.path.join(Config.UPLOAD_FOLDER, filename)
+        os.replace(tmp_path, file_path)
+        rows.append({
+            'filename': filename,
+            'size': round(os.path.getsize(file_path) / (1024 * 1024), 2),
+            'path': f"/static/uploads/{filename}",
+            'sha256': e['sha256'],
+        })
+
+    if rows:
+        try:
+            db.session.execute(insert(PDFUpload), rows)
+            db.session.commit()
+        except IntegrityError:
+            # Some of the same bytes were stored concurrently; fall back to row by row
+            db.session.rollback()
+            for row in rows:
+                db.session.add(PDFUpload(**row))
+                try:
+                    db.session.commit()
+                except IntegrityError:
+                    db.session.rollback()
+                    _discard(os.path.join(Config.UPLOAD_FOLDER, row['filename']))
+                    for e in received:
+                        if e['sha256'] == row['sha256']:
+                            e['status'] = 'duplicate'
+
+    uploads = {}
+    if shas:
+        uploads = {u.sha256: u for u in PDFUpload.query.filter(PDFUpload.sha256.in_(shas)).all()}
+    for e in received:
+        upload = uploads[e['sha256']]
+        e.update(filename=upload.filename, path=upload.path, size=upload.size)
+
+    counts = {
+        s: sum(1 for e in entries if e['status'] == s) for s in ('stored', 'duplicate', 'rejected')
+    }
+    current_app.logger.info('upload batch', extra={"context": {"files": len(entries), **counts}})
+    if not received:
+        return {'error': 'No valid PDF files in batch', 'files': entries}, 400
+    return {
+        'status': 'success',
+        'total': len(entries),
+        'stored': counts['stored'],
+        'duplicates': counts['duplicate'],
+        'rejected': counts['rejected'],
+        'files': entries,
+    }, 200
+
+
+def record_batch(files: list[dict]) -> str:
+    """Keep a save_uploads file list (with any queued {kind: job_id}) so
+    get_upload_batch can report on it later; returns the batch id."""
+    batch = UploadBatch(id=uuid.uuid4().hex, files_json=json.dumps(files))
+    db.session.add(batch)
+    db.session.commit()
+    return batch.id
+
+
+def _rollup(counts: dict) -> str:
+    # One status for the extraction jobs of a whole batch
+    if not sum(counts.values()):
+        return 'complete'  # nothing was queued
+    if counts['queued'] or counts['running']:
+        return 'running'
+    failed = counts['failed'] + counts['missing']
+    if not failed:
+        return 'succeeded'
+    return 'failed' if not counts['succeeded'] else 'partial'
+
+
+def get_upload_batch(batch_id: str) -> Tuple[dict, int]:
+    """Upload outcome and extraction job status of every file in a batch.
+
+    All of the batch's jobs are loaded in one query; batch_status is
+    running while any job is queued or running, then succeeded, partial
+    or failed (complete when no extraction was queued).
+    """
+    batch = db.session.get(UploadBatch, batch_id)
+    if batch is None:
+        return {'error': 'Upload batch not found'}, 404
+    files = batch.files
+    ids = [job_id for f in files for job_id in f.get('jobs', {}).values()]
+    jobs = {job.id: job for job in Job.query.filter(Job.id.in_(ids)).all()} if ids else {}
+    # Duplicates within a batch share their original's jobs; count each job once
+    counts = {s: 0 for s in ('queued', 'running', 'succeeded', 'failed', 'missing')}
+    for job_id in set(ids):
+        status = jobs[job_id].status if job_id in jobs else 'missing'
+        counts[status] = counts.get(status, 0) + 1
+    for f in files:
+        if 'jobs' not in f:
+            continue
+        states = {}
+        for kind, job_id in f['jobs'].items():
+            job = jobs.get(job_id)
+            if job is None:
+                states[kind] = {'id': job_id, 'status': 'missing'}
+                continue
+            states[kind] = {
+                'id': job.id,
+                'status': job.status,
+                'progress': json.loads(job.progress_json or '{}'),
+                'error': job.error,
+                'status_url': f'/jobs/{job.id}',
+            }
+        f['jobs'] = states
+    return {
+        'status': 'success',
+        'batch_id': batch.id,
+        'batch_status': _rollup(counts),
+        'job_counts': counts,
+        'created_at': batch.created_at.isoformat() + 'Z' if batch.created_at else None,
+        'files': files,
+    }, 200
+
+
+def _part_path(session_id: str) -> str:
+    return os.path.join(_temp_dir(), f"{session_id}.part")
+
+
+def _session_hasher(session: UploadSession, part: str):
+    # A copy, so a rejected chunk leaves the remembered state untouched
+    with _hashers_lock:
+        entry = _hashers.get(session.id)
+        if entry is not None and entry[0] == session.offset:
+            _hashers.move_to_end(session.id)
+            return entry[1].copy()
+    # Earlier chunks went to another process (or this one restarted): rehash what is on disk
+    h = hashlib.sha256()
+    remaining = session.offset
+    with open(part, 'rb') as f:
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            h.update(chunk)
+            remaining -= len(chunk)
+    return h
+
+
+def _remember_hasher(session_id: str, offset: int, h):
+    with _hashers_lock:
+        _hashers[session_id] = (offset, h)
+        _hashers.move_to_end(session_id)
+        while len(_hashers) > MAX_HASHERS:
+            _hashers.popitem(last=False)
+
+
+def _forget_hasher(session_id: str):
+    with _hashers_lock:
+        _hashers.pop(session_id, None)
+
+
+def _open_session(session_id: str) -> Tuple[UploadSession | None, Tuple[dict, int] | None]:
+    session = db.session.get(UploadSession, session_id)
+    if session is None:
+        return None, ({'error': 'Upload not found'}, 404)
+    if session.status == 'writing':
+        return None, ({'error': 'A chunk is still being written', 'offset': session.offset}, 409)
+    if session.status != 'open':
+        return None, ({'error': 'Upload already finalized', **session.to_dict()}, 409)
+    if session.offset and not os.path.exists(_part_path(session.id)):
+        return None, ({'error': 'Upload expired; start a new one'}, 410)
+    return session, None
+
+
+def create_session(filename: str, size: int | None = None) -> Tuple[dict, int]:
+    """Start a resumable upload; chunks are then sent with append_chunk."""
+    name = secure_filename(filename or '')
+    if not name or os.path.splitext(name)[1].lower() != '.pdf':
+        return {'error': 'Only PDF files are allowed'}, 400
+    if size is not None and size > _max_bytes():
+        return too_large()
+    session = UploadSession(id=uuid.uuid4().hex, filename=name, size=size, offset=0, status='open')
+    db.session.add(session)
+    db.session.commit()
+    return session.to_dict(), 201
+
+
+def get_session(session_id: str) -> Tuple[dict, int]:
+    session = db.session.get(UploadSession, session_id)
+    if session is None:
+        return {'error': 'Upload not found'}, 404
+    return session.to_dict(), 200
+
+
+def _claim_write(session_id: str, offset: int) -> bool:
+    # Conditional UPDATE: exactly one request (in any process) moves the
+    # session from 'open' at this offset to 'writing'
+    stale = datetime.utcnow() - timedelta(seconds=WRITE_CLAIM_STALE_SECONDS)
+    result = db.session.execute(
+        update(UploadSession)
+        .where(
+            UploadSession.id == session_id,
+            UploadSession.offset == offset,
+            or_(
+                UploadSession.status == 'open',
+                and_(UploadSession.status == 'writing', UploadSession.updated_at < stale),
+            ),
+        )
+        .values(status='writing', updated_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def append_chunk(session_id: str, stream, offset: int) -> Tuple[dict, int]:
+    """Write a chunk at offset, which must equal the bytes received so far.
+
+    A mismatch answers 409 with the current offset so the client can
+    resume from there. Bytes past the stored offset (a chunk cut off by a
+    crash or dropped connection) are truncated before writing. Concurrent
+    chunks for one session are serialised by claiming it first; the loser
+    gets 409 with the offset as of its request.
+    """
+    session = db.session.get(UploadSession, session_id)
+    if session is None:
+        return {'error': 'Upload not found'}, 404
+    if session.status == 'complete':
+        return {'error': 'Upload already finalized', **session.to_dict()}, 409
+    if offset != session.offset:
+        return {'error': 'Offset mismatch', 'offset': session.offset}, 409
+    if not _claim_write(session.id, offset):
+        db.session.refresh(session)
+        return {'error': 'A chunk is already being written', 'offset': session.offset}, 409
+    try:
+        return _write_chunk(session, stream)
+    finally:
+        # A rejected or failed chunk releases the claim at the old offset
+        if session.status == 'writing':
+            session.status = 'open'
+            db.session.commit()
+
+
+def _write_chunk(session: UploadSession, stream) -> Tuple[dict, int]:
+    # Runs while this request holds the session's write claim
+    if session.offset and not os.path.exists(_part_path(session.id)):
+        return {'error': 'Upload expired; start a new one'}, 410
+    part = _part_path(session.id)
+    limit = _max_bytes() if session.size is None else min(session.size, _max_bytes())
+    h = _session_hasher(session, part) if session.offset else hashlib.sha256()
+    try:
+        with open(part, 'ab') as out:
+            out.truncate(session.offset)
+            head = b''
+            if session.offset < len(PDF_MAGIC):
+                with open(part, 'rb') as f:
+                    head = f.read(session.offset)
+            size, problem = _copy_checked(stream, out, h, session.offset, limit, head)
+            if problem:
+                out.truncate(session.offset)
+    except RequestEntityTooLarge:
+        return too_large()
+    except OSError:
+        current_app.logger.error('upload chunk failed', extra={"context": {
+            "upload_id": session.id,
+        }})
+        return {'error': 'Upload failed. Please try again.', 'offset': session.offset}, 500
+    if problem == 'invalid':
+        return {'error': 'Invalid PDF content', 'offset': session.offset}, 400
+    if problem == 'too_large':
+        if session.size is not None and session.size < _max_bytes():
+            return {
+                'error': 'Chunk runs past the declared upload size', 'offset': session.offset,
+            }, 413
+        return too_large()
+
+    session.offset = size
+    session.status = 'open'
+    db.session.commit()
+    _remember_hasher(session.id, size, h)
+    return session.to_dict(), 200
+
+
+def finalize_session(session_id: str) -> Tuple[dict, int]:
+    """Store a fully received upload (deduplicated like save_upload).
+
+    Repeating the call after success returns the same record, so a lost
+    response can simply be retried.
+    """
+    session = db.session.get(UploadSession, session_id)
+    if session is not None and session.status == 'complete':
+        upload = db.session.get(PDFUpload, session.upload_id)
+        if upload is not None:
+            # upload_date has second precision
+            created = session.created_at.replace(microsecond=0)
+            duplicate = upload.upload_date is not None and upload.upload_date < created
+            return _upload_body(upload, duplicate=duplicate), 200
+    session, error = _open_session(session_id)
+    if error:
+        return error
+    if session.size is not None and session.offset != session.size:
+        return {'error': 'Upload incomplete', 'offset': session.offset, 'size': session.size}, 409
+    if session.offset < len(PDF_MAGIC):
+        return {'error': 'Invalid PDF content'}, 400
+
+    part = _part_path(session.id)
+    sha = _session_hasher(session, part).hexdigest()
+    _forget_hasher(session.id)
+    return _store_file(part, sha, session.filename, session)
+
+
+def abort_session(session_id: str) -> Tuple[dict, int]:
+    session = db.session.get(UploadSession, session_id)
+    if session is None:
+        return {'error': 'Upload not found'}, 404
+    if session.status == 'writing':
+        return {'error': 'A chunk is still being written', 'offset': session.offset}, 409
+    if session.status == 'open':
+        _discard(_part_path(session.id))
+        _forget_hasher(session.id)
+        db.session.delete(session)
+        db.session.commit()
+    return {'status': 'success'}, 200
+
+
+def content_source(filename: str) -> str:
+    """Filename whose extraction results serve this upload: that of the
+    upload holding its content hash (itself unless it is a duplicate).
+
+    Uploads stored before hashing are hashed on first use; the first one
+    seen claims the hash and later duplicates resolve to it.
+    """
+    upload = PDFUpload.query.filter_by(filename=filename).order_by(PDFUpload.id.asc()).first()
+    if upload is None or upload.sha256:
+        return filename
+    with _legacy_lock:
+        sha = _legacy_hashes.get(filename)
+    if sha is None:
+        path = os.path.join(Config.UPLOAD_FOLDER, filename)
+        try:
+            sha = file_sha256(path)
+        except OSError:
+            return filename
+        with _legacy_lock:
+            _legacy_hashes[filename] = sha
+    owner = PDFUpload.query.filter_by(sha256=sha).first()
+    if owner is None:
+        upload.sha256 = sha
+        try:
+            db.session.commit()
+            return filename
+        except IntegrityError:
+            db.session.rollback()
+            owner = PDFUpload.query.filter_by(sha256=sha).first()
+    return owner.filename if owner else filename
@@ -0,0 +1,26 @@
+import os
+import tempfile
+
+import pytest
+
+# Config is read at import time: point the app at a throwaway database and
+# upload folder before anything imports it
+_TMP = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(_TMP, 'test.db')}"
+os.environ["UPLOAD_FOLDER"] = os.path.join(_TMP, "static", "uploads")
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app as flask_app
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def pdf_bytes(tag: str, pad: int = 0) -> bytes:
+    # Distinct content per test, so uploads never dedupe against each other
+    return b"%PDF-1.4\n% " + tag.encode() + b"\n" + b"x" * pad + b"\n%%EOF\n"
@@ -0,0 +1,63 @@
+"""Page-range parallel image extraction (services.image_service._write_images)."""
+import io
+
+import fitz
+import pytest
+from PIL import Image
+
+from extraction.engines import page_ranges
+from services.image_service import _write_images
+
+
+def _pdf_with_images(path, pages=12):
+    # A distinct image on every page except every fourth one, so some
+    # page ranges hold no images
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        if i % 4 == 3:
+            continue
+        buf = io.BytesIO()
+        Image.new("RGB", (40 + i, 30), (20 * i % 256, 90, 160)).save(buf, "PNG")
+        page.insert_image(fitz.Rect(50, 50, 250, 200), stream=buf.getvalue())
+    doc.save(path)
+    doc.close()
+
+
+def _first_seen(path):
+    first_seen = {}
+    with fitz.open(path) as doc:
+        for page_index, page in enumerate(doc):
+            for img in page.get_images(full=True):
+                first_seen.setdefault(img[0], (page_index + 1, f"p{page_index + 1}_x{img[0]}"))
+        return first_seen, len(doc)
+
+
+@pytest.mark.parametrize("count,parts", [(1, 1), (7, 3), (12, 8), (5, 20), (100, 16)])
+def test_page_ranges_partition(count, parts):
+    ranges = page_ranges(count, parts)
+    assert len(ranges) == min(count, parts)
+    assert ranges[0][0] == 0 and ranges[-1][1] == count
+    assert all(a < b for a, b in ranges)
+    assert all(prev[1] == nxt[0] for prev, nxt in zip(ranges, ranges[1:]))
+    sizes = [b - a for a, b in ranges]
+    assert max(sizes) - min(sizes) <= 1
+
+
+def test_parallel_writes_match_serial(tmp_path):
+    pdf = str(tmp_path / "doc.pdf")
+    _pdf_with_images(pdf)
+    first_seen, page_count = _first_seen(pdf)
+    out = {}
+    for workers in (0, 2):
+        images_dir = tmp_path / f"w{workers}"
+        images_dir.mkdir()
+        progress = list(_write_images(pdf, first_seen, page_count, str(images_dir), workers))
+        done = [pages for pages, _ in progress]
+        assert done == sorted(done) and done[-1] == page_count
+        written = dict(item for _, items in progress for item in items)
+        assert set(written) == set(first_seen)
+        assert all(w is not None for w in written.values())
+        files = {p.name: p.read_bytes() for p in images_dir.iterdir()}
+        out[workers] = (written, files)
+    assert out[0] == out[2]
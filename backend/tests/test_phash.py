@@ -0,0 +1,67 @@
+"""dHash near-duplicate lookup (ocr.phash)."""
+import io
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+from ocr.phash import BKTree, confirm_near, dhash, hamming
+
+
+def _random_hashes(rng, count):
+    # Clustered like real image hashes: bases plus a few flipped bits
+    bases = [rng.getrandbits(64) for _ in range(count // 10)]
+    out = []
+    for i in range(count):
+        h = bases[i % len(bases)]
+        for _ in range(rng.randrange(8)):
+            h ^= 1 << rng.randrange(64)
+        out.append(f"{h:016x}")
+    return out
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 5, 10])
+def test_bktree_search_matches_brute_force(max_distance):
+    rng = random.Random(max_distance)
+    hashes = _random_hashes(rng, 500)
+    tree = BKTree()
+    for i, h in enumerate(hashes):
+        tree.add(h, i)
+    assert tree.size == len(hashes)
+    for query in hashes[:50] + _random_hashes(rng, 50):
+        distances = [(hamming(query, h), i) for i, h in enumerate(hashes)]
+        expected = sorted((d, i) for d, i in distances if d <= max_distance)
+        found = tree.search(query, max_distance)
+        assert sorted(found) == expected
+        assert [d for d, _ in found] == sorted(d for d, _ in found)
+
+
+def test_bktree_keeps_duplicate_hashes():
+    tree = BKTree()
+    tree.add("00000000000000ff", "a")
+    tree.add("00000000000000ff", "b")
+    assert sorted(tree.search("00000000000000ff", 0)) == [(0, "a"), (0, "b")]
+    assert BKTree().search("00000000000000ff", 64) == []
+
+
+def _poster(text, size=(400, 300)):
+    img = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(img)
+    for k in range(6):
+        draw.rectangle((20 + 60 * k, 40, 50 + 60 * k, 260), fill=40 * k)
+    draw.text((30, 10), text, fill=0)
+    return img
+
+
+def test_reencoded_copy_is_near_and_confirmed():
+    original = _poster("Sunrise Residency")
+    buf = io.BytesIO()
+    original.resize((300, 225)).save(buf, "JPEG", quality=60)
+    buf.seek(0)
+    copy = Image.open(buf)
+    assert hamming(dhash(original), dhash(copy)) <= 5
+    assert confirm_near(original, copy)
+
+
+def test_different_aspect_is_not_confirmed():
+    assert not confirm_near(_poster("A"), _poster("A", size=(400, 200)))
@@ -0,0 +1,130 @@
+"""Strip decoding and tile planning for very large images (ocr.imread, ocr.tiling)."""
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from ocr import engines
+from ocr.imread import gray_strips, iter_png_strips
+from ocr.tiling import plan_tiles
+
+
+def _pattern(h, w):
+    # Gradients plus noise, so the encoder picks a mix of row filters
+    rng = np.random.default_rng(h * w)
+    y, x = np.mgrid[0:h, 0:w]
+    base = (x * 3 + y * 5) % 256
+    return (base + rng.integers(0, 40, (h, w))).astype(np.uint8)
+
+
+def _save(path, mode, h=203, w=157):
+    gray = _pattern(h, w)
+    if mode == "L":
+        img = Image.fromarray(gray)
+    elif mode == "LA":
+        img = Image.merge("LA", [Image.fromarray(gray), Image.fromarray(255 - gray)])
+    elif mode == "RGB":
+        img = Image.fromarray(np.dstack([gray, gray[::-1], 255 - gray]))
+    elif mode == "RGBA":
+        img = Image.fromarray(np.dstack([gray, gray[::-1], 255 - gray, gray // 2 + 100]))
+    else:
+        img = Image.fromarray(np.dstack([gray, 255 - gray, gray])).quantize(200)
+        img.info["transparency"] = 3
+    img.save(path, optimize=True)
+    return img
+
+
+@pytest.mark.parametrize("mode", ["L", "LA", "RGB", "RGBA", "P"])
+@pytest.mark.parametrize("rows", [1, 7, 64, 500])
+def test_png_strips_match_full_decode(tmp_path, mode, rows):
+    path = str(tmp_path / f"{mode}.png")
+    _save(path, mode)
+    with Image.open(path) as full:
+        expected = np.asarray(full.convert("L"))
+        strips = list(iter_png_strips(path, rows))
+        assert strips[0][1].mode == full.mode
+    assert [y for y, _ in strips] == list(range(0, expected.shape[0], rows))
+    decoded = np.vstack([np.asarray(s.convert("L")) for _, s in strips])
+    assert np.array_equal(decoded, expected)
+
+
+def test_gray_strips_stay_within_budget(tmp_path):
+    path = str(tmp_path / "big.png")
+    _save(path, "RGB", h=900, w=300)
+    (h, w), strips = gray_strips(path, max_bytes=300 * 20 * 50)
+    strips = list(strips)
+    assert (h, w) == (900, 300)
+    assert len(strips) == 18 and all(s.shape == (50, 300) for _, s in strips)
+    with Image.open(path) as full:
+        assert np.array_equal(np.vstack([s for _, s in strips]), np.asarray(full.convert("L")))
+
+
+def test_unsupported_png_falls_back_to_whole_decode(tmp_path):
+    path = str(tmp_path / "bilevel.png")
+    Image.fromarray(_pattern(60, 80)).convert("1").save(path)
+    with pytest.raises(ValueError):
+        next(iter_png_strips(path, 8))
+    (h, w), strips = gray_strips(path, max_bytes=1024)
+    strips = list(strips)
+    assert (h, w) == (60, 80) and len(strips) == 1
+
+
+@pytest.mark.parametrize("h,w,tile,overlap", [
+    (100, 100, 512, 64),
+    (4000, 3000, 1024, 128),
+    (2049, 5000, 2048, 192),
+    (1000, 1000, 300, 0),
+    (777, 1333, 256, 64),
+])
+def test_plan_tiles_cores_partition_the_image(h, w, tile, overlap):
+    owner = np.zeros((h, w), dtype=np.int32)
+    for (y0, y1, x0, x1), (cy0, cy1, cx0, cx1) in plan_tiles(h, w, tile, overlap):
+        assert 0 <= y0 <= cy0 < cy1 <= y1 <= h
+        assert 0 <= x0 <= cx0 < cx1 <= x1 <= w
+        owner[cy0:cy1, cx0:cx1] += 1
+    assert (owner == 1).all()
+
+
+def test_plan_tiles_respects_tile_size():
+    plan = plan_tiles(5000, 4100, 1024, 128)
+    assert all(y1 - y0 <= 1024 and x1 - x0 <= 1024 for (y0, y1, x0, x1), _ in plan)
+    # Only the last tile of a row or column is cut short
+    assert all(x1 - x0 == 1024 for (_, _, x0, x1), _ in plan if x1 < 4100)
+    assert all(y1 - y0 == 1024 for (y0, y1, _, _), _ in plan if y1 < 5000)
+
+
+def test_checkout_reader_is_exclusive(monkeypatch):
+    class Reader:
+        def __init__(self, langs, gpu=False):
+            self.langs = langs
+
+    class Module:
+        pass
+
+    module = Module()
+    module.Reader = Reader
+    monkeypatch.setattr(engines.registry, "load", lambda name: module)
+    monkeypatch.setattr(engines, "_readers", engines.OrderedDict())
+    monkeypatch.setattr(engines, "_spare_readers", {})
+    monkeypatch.setattr(engines, "_in_use", set())
+
+    held, ready, release = [], threading.Barrier(4), threading.Event()
+
+    def tile():
+        with engines.checkout_reader(["en"]) as reader:
+            held.append(reader)
+            ready.wait()
+            release.wait()
+
+    threads = [threading.Thread(target=tile) for _ in range(3)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    assert len({id(r) for r in held}) == 3
+    release.set()
+    for t in threads:
+        t.join()
+    assert engines._in_use == set()
+    with engines.checkout_reader(["en"]) as reader:
+        assert reader in held
@@ -0,0 +1,78 @@
+"""Batch uploads of PDFs and .zip archives (services.upload_service.save_uploads)."""
+import io
+import zipfile
+
+from config import Config
+from tests.conftest import pdf_bytes
+
+MB = 1024 * 1024
+
+
+def _zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    buf.seek(0)
+    return buf
+
+
+def _post(client, *files):
+    return client.post(
+        "/upload/batch", data={"files": list(files)}, content_type="multipart/form-data"
+    )
+
+
+def _statuses(body):
+    return {f["name"]: (f["status"], f.get("error")) for f in body["files"]}
+
+
+def test_zip_member_over_the_file_limit_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(Config, "UPLOAD_MAX_MB", 1)
+    archive = _zip([
+        ("small.pdf", pdf_bytes("zip-small")),
+        ("big.pdf", pdf_bytes("zip-big", pad=MB)),
+        ("notes.txt", b"hello"),
+        ("__MACOSX/._small.pdf", b"resource fork"),
+    ])
+    r = _post(client, (archive, "brochures.zip"))
+    assert r.status_code == 200
+    assert _statuses(r.get_json()) == {
+        "small.pdf": ("stored", None),
+        "big.pdf": ("rejected", "File too large (max 1MB)"),
+        "notes.txt": ("rejected", "Only PDF files are allowed"),
+    }
+
+
+def test_unpacked_members_count_against_the_batch_size(client, monkeypatch):
+    monkeypatch.setattr(Config, "UPLOAD_MAX_MB", 1)
+    monkeypatch.setattr(Config, "UPLOAD_BATCH_MAX_MB", 2)
+    # Highly compressible: the archive is tiny, its members are not
+    members = [(f"m{i}.pdf", pdf_bytes(f"budget-{i}", pad=MB * 9 // 10)) for i in range(3)]
+    archive = _zip(members)
+    assert len(archive.getvalue()) < MB // 10
+    r = _post(client, (archive, "big.zip"))
+    body = r.get_json()
+    assert r.status_code == 200 and body["stored"] == 2 and body["rejected"] == 1
+    assert _statuses(body)["m2.pdf"] == ("rejected", "File too large (max 1MB)")
+
+
+def test_file_count_limit_and_in_batch_duplicates(client, monkeypatch):
+    monkeypatch.setattr(Config, "UPLOAD_BATCH_MAX_FILES", 2)
+    same = pdf_bytes("dup")
+    archive = _zip([("a.pdf", same), ("b.pdf", same), ("c.pdf", pdf_bytes("count-c"))])
+    r = _post(client, (archive, "set.zip"))
+    body = r.get_json()
+    assert r.status_code == 200
+    statuses = _statuses(body)
+    assert statuses["a.pdf"] == ("stored", None)
+    assert statuses["b.pdf"] == ("duplicate", None)
+    assert statuses["c.pdf"] == ("rejected", "Too many files in batch (max 2)")
+    by_name = {f["name"]: f for f in body["files"]}
+    assert by_name["a.pdf"]["filename"] == by_name["b.pdf"]["filename"]
+
+
+def test_bad_archive_and_no_valid_files(client):
+    r = _post(client, (io.BytesIO(b"PK\x03\x04 truncated"), "broken.zip"))
+    assert r.status_code == 400
+    assert _statuses(r.get_json()) == {"broken.zip": ("rejected", "Invalid zip archive")}
@@ -0,0 +1,101 @@
+"""Resumable chunked uploads (services.upload_service)."""
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+from db import db
+from models.upload_session import UploadSession
+from services import upload_service
+from tests.conftest import pdf_bytes
+
+
+def _start(client, data, name="doc.pdf"):
+    r = client.post("/uploads", json={"filename": name, "size": len(data)})
+    assert r.status_code == 201
+    return r.get_json()["upload_id"]
+
+
+def _patch(client, upload_id, offset, chunk):
+    return client.patch(f"/uploads/{upload_id}", data=chunk, headers={"Upload-Offset": str(offset)})
+
+
+def test_chunks_finalize_to_the_same_bytes(client):
+    data = pdf_bytes("chunks", pad=5000)
+    upload_id = _start(client, data)
+    for start in range(0, len(data), 1777):
+        r = _patch(client, upload_id, start, data[start:start + 1777])
+        assert r.status_code == 200 and r.get_json()["offset"] == min(start + 1777, len(data))
+    r = client.post(f"/uploads/{upload_id}/finalize")
+    body = r.get_json()
+    assert r.status_code == 200 and body["duplicate"] is False
+    assert body["sha256"] == hashlib.sha256(data).hexdigest()
+    with open(os.path.join(os.environ["UPLOAD_FOLDER"], body["filename"]), "rb") as f:
+        assert f.read() == data
+    # A lost finalize response can simply be retried
+    again = client.post(f"/uploads/{upload_id}/finalize").get_json()
+    assert again["filename"] == body["filename"] and again["duplicate"] is False
+
+
+def test_offset_mismatch_reports_where_to_resume(client):
+    data = pdf_bytes("resume", pad=3000)
+    upload_id = _start(client, data)
+    assert _patch(client, upload_id, 0, data[:1000]).status_code == 200
+    r = _patch(client, upload_id, 2000, data[2000:])
+    assert r.status_code == 409 and r.get_json()["offset"] == 1000
+    assert client.get(f"/uploads/{upload_id}").get_json()["offset"] == 1000
+    assert _patch(client, upload_id, 1000, data[1000:]).status_code == 200
+    body = client.post(f"/uploads/{upload_id}/finalize").get_json()
+    assert body["sha256"] == hashlib.sha256(data).hexdigest()
+
+
+def test_resume_after_restart_rehashes_and_drops_a_torn_chunk(client):
+    data = pdf_bytes("restart", pad=4000)
+    upload_id = _start(client, data)
+    assert _patch(client, upload_id, 0, data[:2500]).status_code == 200
+    # A crash mid-chunk left bytes past the stored offset, and the new
+    # process has no running hash for the session
+    with open(upload_service._part_path(upload_id), "ab") as f:
+        f.write(b"torn chunk")
+    upload_service._forget_hasher(upload_id)
+    assert _patch(client, upload_id, 2500, data[2500:]).status_code == 200
+    body = client.post(f"/uploads/{upload_id}/finalize").get_json()
+    assert body["sha256"] == hashlib.sha256(data).hexdigest()
+
+
+def test_one_claim_per_offset(app, client):
+    data = pdf_bytes("claim", pad=100)
+    upload_id = _start(client, data)
+    with app.app_context():
+        assert upload_service._claim_write(upload_id, 0)
+        assert not upload_service._claim_write(upload_id, 0)
+    # A chunk racing the held claim is turned away without touching the file
+    r = _patch(client, upload_id, 0, data)
+    assert r.status_code == 409 and r.get_json()["offset"] == 0
+    assert client.post(f"/uploads/{upload_id}/finalize").status_code == 409
+    assert client.delete(f"/uploads/{upload_id}").status_code == 409
+
+
+def test_stale_claim_is_taken_over(app, client):
+    data = pdf_bytes("stale", pad=100)
+    upload_id = _start(client, data)
+    with app.app_context():
+        assert upload_service._claim_write(upload_id, 0)
+        session = db.session.get(UploadSession, upload_id)
+        session.updated_at = datetime.utcnow() - timedelta(
+            seconds=upload_service.WRITE_CLAIM_STALE_SECONDS + 1
+        )
+        db.session.commit()
+    assert _patch(client, upload_id, 0, data).status_code == 200
+    assert client.get(f"/uploads/{upload_id}").get_json()["status"] == "open"
+
+
+def test_rejected_chunk_keeps_the_offset(client):
+    data = pdf_bytes("reject", pad=100)
+    upload_id = _start(client, data)
+    r = _patch(client, upload_id, 0, b"not a pdf at all")
+    assert r.status_code == 400
+    state = client.get(f"/uploads/{upload_id}").get_json()
+    assert state["offset"] == 0 and state["status"] == "open"
+    r = _patch(client, upload_id, 0, data + b"extra bytes past the declared size")
+    assert r.status_code == 413 and r.get_json()["offset"] == 0
+    assert _patch(client, upload_id, 0, data).status_code == 200